@@ -13,10 +13,21 @@ from cluster import (
     create_eks_cluster,
     create_node_group,
     create_kube_provider,
+    build_kubeconfig,
     create_managed_addons,
 )
-from addons import setup_efs, setup_ebs, setup_ingress, setup_prometheus
+from addons import (
+    create_addon_priority_class,
+    setup_efs,
+    setup_ebs,
+    setup_ingress,
+    setup_prometheus,
+    setup_metrics_server,
+    setup_vpa,
+    setup_image_prepull,
+)
 from irsa_autoscaler import setup_oidc, setup_autoscaler
+from registry import setup_pull_through_cache
 
 cfg = load_config()
 base_tags = build_base_tags(cfg)
@@ -41,12 +52,20 @@ kms_key = create_kms_key(cfg, base_tags)
 log_group = create_cluster_log_group(cfg, base_tags)
 
 cluster = create_eks_cluster(cfg, eks_role, eks_sg, subnet_ids, kms_key, base_tags, log_group)
-kube_provider = create_kube_provider(cluster, cfg["cluster_name"])
+kube_provider = create_kube_provider(
+    cluster, cfg["cluster_name"], cfg["kube_auth"], cfg["region"], cfg["kube_token_ttl"]
+)
 
 # Create OIDC earlier so future IRSA addons can depend on it
 oidc = setup_oidc(cluster, cfg["oidc_thumbprint"])
 
+# In-region ECR caches for upstream registries; chart and pre-pull image
+# references are rewritten to them (addons.image_values, registry.mirror_image)
+registry_mirrors = setup_pull_through_cache(cfg, node_group_role, base_tags)
+cfg["registry_mirrors"] = registry_mirrors
+
 created_node_groups = []
+system_node_groups = []
 for ng_cfg in cfg["node_groups"]:
     name = ng_cfg["name"]
     itype = ng_cfg["instance_type"]
@@ -64,8 +83,15 @@ for ng_cfg in cfg["node_groups"]:
         base_tags,
         ami_family,
         bool(user_ami),
+        cluster=cluster,
+        soci={
+            "version": cfg["soci_snapshotter_version"],
+            "url": cfg["soci_snapshotter_url"],
+            "sha256": cfg["soci_snapshotter_sha256"],
+        } if ng_cfg["soci"] else None,
+        architecture=arch,
     )
-    node_group = create_node_group(
+    node_groups = create_node_group(
         name,
         cfg["cluster_name"],
         ng_cfg,
@@ -76,23 +102,39 @@ for ng_cfg in cfg["node_groups"]:
         cluster,
         base_tags,
     )
-    created_node_groups.append(node_group)
+    created_node_groups.extend(node_groups)
+    if ng_cfg["system"]:
+        system_node_groups.extend(node_groups)
+    if ng_cfg["prepull_images"]:
+        setup_image_prepull(ng_cfg, kube_provider, node_groups, registry_mirrors)
 
 create_managed_addons(cfg, cluster, base_tags)
 
-primary_node_group = created_node_groups[0] if created_node_groups else None
-if cfg["enable_efs"] and primary_node_group:
-    setup_efs(cfg, vpc, node_group_sg, subnet_ids, cfg["cluster_name"], kube_provider, primary_node_group, base_tags)
-if cfg["enable_ebs"] and primary_node_group:
-    setup_ebs(cfg, kube_provider, primary_node_group, base_tags)
-if cfg["enable_ingress"] and primary_node_group:
-    setup_ingress(cfg, kube_provider, primary_node_group, base_tags)
-if cfg["enable_prometheus"] and primary_node_group:
-    setup_prometheus(cfg, kube_provider, primary_node_group, base_tags)
+# Addons land on the system node groups; without one, fall back to the first group.
+addon_node_groups = system_node_groups or created_node_groups[:1]
+if addon_node_groups:
+    priority_class = create_addon_priority_class(kube_provider)
+    addon_deps = [*addon_node_groups, priority_class]
+    if cfg["enable_efs"]:
+        setup_efs(cfg, vpc, node_group_sg, subnet_ids, cfg["cluster_name"], kube_provider, addon_deps, base_tags)
+    if cfg["enable_ebs"]:
+        setup_ebs(cfg, kube_provider, addon_deps, base_tags)
+    if cfg["enable_ingress"]:
+        setup_ingress(cfg, kube_provider, addon_deps, base_tags)
+    if cfg["enable_prometheus"]:
+        setup_prometheus(cfg, kube_provider, addon_deps, base_tags)
+    if cfg["enable_metrics_server"]:
+        metrics_server = setup_metrics_server(cfg, kube_provider, addon_deps, base_tags)
+        if cfg["enable_vpa"]:
+            setup_vpa(cfg, kube_provider, [*addon_deps, metrics_server], base_tags)
 
 setup_autoscaler(cfg, oidc, kube_provider, created_node_groups, cfg["cluster_name"], cfg["region"], base_tags)
 
-pulumi.export("kubeconfig", pulumi.Output.secret(kube_provider.kubeconfig))
+pulumi.export("kubeconfig", pulumi.Output.secret(build_kubeconfig(cluster, cfg["cluster_name"])))
+# Same, authenticating through eks_token.py with its on-disk token cache
+pulumi.export("kubeconfig_cached", pulumi.Output.secret(build_kubeconfig(
+    cluster, cfg["cluster_name"], "cached-exec", cfg["region"], cfg["kube_token_ttl"]
+)))
 pulumi.export("cluster", {
     "name": cfg["cluster_name"],
     "arn": cluster.arn,
@@ -107,8 +149,10 @@ pulumi.export("cluster", {
         "control_plane": eks_sg.id,
         "nodes": node_group_sg.id,
     },
+    "registry_mirrors": registry_mirrors,
     "node_groups": [{
         "name": ng.node_group_name,
         "arn": ng.arn,
+        "launch_template_version": ng.launch_template.apply(lambda t: t.version if t else None),
     } for ng in created_node_groups],
 })
\ No newline at end of file
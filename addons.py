@@ -1,8 +1,131 @@
+import copy
 import pulumi_aws as aws
 import pulumi_kubernetes as k8s
 from pulumi import ResourceOptions
+from registry import mirror_image, mirror_registry
+from validate import SYSTEM_NODE_LABELS, SYSTEM_TAINT
 
-def setup_efs(cfg, vpc, node_group_sg, subnet_ids, cluster_name, kube_provider, node_group, base_tags):
+# PriorityClass for platform addons outside kube-system; sits below the
+# built-in system-*-critical classes and above application workloads.
+ADDON_PRIORITY_CLASS = "platform-addons"
+
+# Default requests so addons are scheduled against reserved capacity.
+ADDON_RESOURCES = {
+    "ebs-csi-controller": {"requests": {"cpu": "50m", "memory": "64Mi"}},
+    "ingress-nginx": {"requests": {"cpu": "100m", "memory": "128Mi"}},
+    "prometheus": {"requests": {"cpu": "500m", "memory": "2Gi"}},
+    "alertmanager": {"requests": {"cpu": "50m", "memory": "128Mi"}},
+    "prometheus-operator": {"requests": {"cpu": "100m", "memory": "128Mi"}},
+    "grafana": {"requests": {"cpu": "100m", "memory": "256Mi"}},
+    "kube-state-metrics": {"requests": {"cpu": "50m", "memory": "128Mi"}},
+    "cluster-autoscaler": {"requests": {"cpu": "100m", "memory": "300Mi"}},
+    "metrics-server": {"requests": {"cpu": "100m", "memory": "200Mi"}},
+    "vpa-recommender": {"requests": {"cpu": "50m", "memory": "500Mi"}},
+    "vpa-updater": {"requests": {"cpu": "50m", "memory": "500Mi"}},
+    "vpa-admission-controller": {"requests": {"cpu": "50m", "memory": "200Mi"}},
+}
+
+# Image fields of each chart and their upstream defaults, as dotted values
+# paths. ``*.registry`` fields hold a registry host, the others a repository.
+CHART_IMAGES = {
+    "ebs-csi": {
+        "image.repository": "public.ecr.aws/ebs-csi-driver/aws-ebs-csi-driver",
+        "sidecars.provisioner.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/external-provisioner",
+        "sidecars.attacher.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/external-attacher",
+        "sidecars.snapshotter.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/external-snapshotter/csi-snapshotter",
+        "sidecars.livenessProbe.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/livenessprobe",
+        "sidecars.resizer.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/external-resizer",
+        "sidecars.nodeDriverRegistrar.image.repository": "public.ecr.aws/eks-distro/kubernetes-csi/node-driver-registrar",
+        "sidecars.volumemodifier.image.repository": "public.ecr.aws/ebs-csi-driver/volume-modifier-for-k8s",
+    },
+    "ingress-nginx": {
+        "global.image.registry": "registry.k8s.io",
+    },
+    "kube-prom-stack": {
+        "prometheus.prometheusSpec.image.registry": "quay.io",
+        "alertmanager.alertmanagerSpec.image.registry": "quay.io",
+        "prometheusOperator.image.registry": "quay.io",
+        "prometheusOperator.prometheusConfigReloader.image.registry": "quay.io",
+        "prometheusOperator.admissionWebhooks.patch.image.registry": "registry.k8s.io",
+        "kube-state-metrics.image.registry": "registry.k8s.io",
+        "prometheus-node-exporter.image.registry": "quay.io",
+        "grafana.image.registry": "docker.io",
+        "grafana.sidecar.image.registry": "quay.io",
+    },
+    "cluster-autoscaler": {
+        "image.repository": "registry.k8s.io/autoscaling/cluster-autoscaler",
+    },
+    "metrics-server": {
+        "image.repository": "registry.k8s.io/metrics-server/metrics-server",
+    },
+    "vpa": {
+        "recommender.image.repository": "registry.k8s.io/autoscaling/vpa-recommender",
+        "updater.image.repository": "registry.k8s.io/autoscaling/vpa-updater",
+        "admissionController.image.repository": "registry.k8s.io/autoscaling/vpa-admission-controller",
+    },
+}
+
+def image_values(cfg, chart):
+    """Chart values pointing ``chart``'s images at the ECR pull-through cache.
+
+    Empty when no upstream the chart uses is cached.
+    """
+    mirrors = cfg.get("registry_mirrors") or {}
+    values = {}
+    for path, default in CHART_IMAGES[chart].items():
+        mirror = mirror_registry if path.endswith(".registry") else mirror_image
+        mirrored = mirror(default, mirrors)
+        if mirrored == default:
+            continue
+        *parents, leaf = path.split(".")
+        node = values
+        for key in parents:
+            node = node.setdefault(key, {})
+        node[leaf] = mirrored
+    return values
+
+def deep_merge(base, override):
+    """Return ``base`` updated recursively with ``override``; override wins."""
+    merged = copy.deepcopy(base)
+    for key, value in (override or {}).items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = deep_merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+def system_placement(cfg):
+    """nodeSelector/tolerations pinning a pod to the ``system: true`` node groups.
+
+    Empty when no system node group is configured, so addons keep being
+    scheduled wherever they fit.
+    """
+    if not any(ng.get("system") for ng in cfg["node_groups"]):
+        return {}
+    return {
+        "nodeSelector": dict(SYSTEM_NODE_LABELS),
+        "tolerations": [{"key": SYSTEM_TAINT["key"], "operator": "Exists", "effect": "NoSchedule"}],
+    }
+
+def addon_pod_values(cfg, resources_key, priority_class=ADDON_PRIORITY_CLASS):
+    """Placement, priority and requests for one addon component, in the common chart layout."""
+    return {
+        **system_placement(cfg),
+        "priorityClassName": priority_class,
+        "resources": ADDON_RESOURCES[resources_key],
+    }
+
+def create_addon_priority_class(kube_provider):
+    return k8s.scheduling.v1.PriorityClass(
+        "pc-platform-addons",
+        metadata={"name": ADDON_PRIORITY_CLASS},
+        value=1000000,
+        global_default=False,
+        description="Platform addons (ingress, monitoring); preempts application pods.",
+        opts=ResourceOptions(provider=kube_provider),
+    )
+
+def setup_efs(cfg, vpc, node_group_sg, subnet_ids, cluster_name, kube_provider, depends_on, base_tags):
     efs_sg = aws.ec2.SecurityGroup(
         "efs-sg",
         vpc_id=vpc.id,
@@ -35,7 +158,7 @@ def setup_efs(cfg, vpc, node_group_sg, subnet_ids, cluster_name, kube_provider,
         )
     # External EFS CSI driver typically installed separately; skip chart here (optional).
 
-def setup_ebs(cfg, kube_provider, node_group, base_tags):
+def setup_ebs(cfg, kube_provider, depends_on, base_tags):
     k8s.helm.v3.Chart(
         "ebs-csi",
         k8s.helm.v3.ChartOpts(
@@ -45,12 +168,15 @@ def setup_ebs(cfg, kube_provider, node_group, base_tags):
                 repo="https://kubernetes-sigs.github.io/aws-ebs-csi-driver"
             ),
             namespace="kube-system",
-            values={},
+            values=deep_merge({
+                "controller": addon_pod_values(cfg, "ebs-csi-controller", "system-cluster-critical"),
+                "node": {"priorityClassName": "system-node-critical"},
+            }, image_values(cfg, "ebs-csi")),
         ),
-        opts=ResourceOptions(provider=kube_provider, depends_on=[node_group]),
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
     )
 
-def setup_ingress(cfg, kube_provider, node_group, base_tags):
+def setup_ingress(cfg, kube_provider, depends_on, base_tags):
     k8s.helm.v3.Chart(
         "ingress-nginx",
         k8s.helm.v3.ChartOpts(
@@ -60,12 +186,15 @@ def setup_ingress(cfg, kube_provider, node_group, base_tags):
                 repo="https://kubernetes.github.io/ingress-nginx"
             ),
             namespace="ingress-nginx",
-            values=cfg["ingress_nginx_values"],
+            values=deep_merge(deep_merge({
+                "controller": addon_pod_values(cfg, "ingress-nginx"),
+                "defaultBackend": system_placement(cfg),
+            }, image_values(cfg, "ingress-nginx")), cfg["ingress_nginx_values"]),
         ),
-        opts=ResourceOptions(provider=kube_provider, depends_on=[node_group]),
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
     )
 
-def setup_prometheus(cfg, kube_provider, node_group, base_tags):
+def setup_prometheus(cfg, kube_provider, depends_on, base_tags):
     k8s.helm.v3.Chart(
         "kube-prom-stack",
         k8s.helm.v3.ChartOpts(
@@ -75,7 +204,115 @@ def setup_prometheus(cfg, kube_provider, node_group, base_tags):
                 repo="https://prometheus-community.github.io/helm-charts"
             ),
             namespace="monitoring",
-            values=cfg["prometheus_stack_values"],
+            values=deep_merge(deep_merge({
+                "prometheus": {"prometheusSpec": addon_pod_values(cfg, "prometheus")},
+                "alertmanager": {"alertmanagerSpec": addon_pod_values(cfg, "alertmanager")},
+                "prometheusOperator": addon_pod_values(cfg, "prometheus-operator"),
+                "grafana": addon_pod_values(cfg, "grafana"),
+                "kube-state-metrics": addon_pod_values(cfg, "kube-state-metrics"),
+            }, image_values(cfg, "kube-prom-stack")), cfg["prometheus_stack_values"]),
+        ),
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
+    )
+
+def setup_metrics_server(cfg, kube_provider, depends_on, base_tags):
+    """metrics-server backs the metrics API that HPAs and the VPA recommender read."""
+    replicas = cfg["metrics_server_replicas"]
+    values = {
+        **addon_pod_values(cfg, "metrics-server", "system-cluster-critical"),
+        "replicas": replicas,
+        "args": [f"--metric-resolution={cfg['metrics_server_resolution']}"],
+        "podDisruptionBudget": {"enabled": replicas > 1, "minAvailable": 1},
+    }
+    return k8s.helm.v3.Chart(
+        "metrics-server",
+        k8s.helm.v3.ChartOpts(
+            chart="metrics-server",
+            version=cfg["metrics_server_version"],
+            fetch_opts=k8s.helm.v3.FetchOpts(
+                repo="https://kubernetes-sigs.github.io/metrics-server"
+            ),
+            namespace="kube-system",
+            values=deep_merge(deep_merge(values, image_values(cfg, "metrics-server")), cfg["metrics_server_values"]),
+        ),
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
+    )
+
+def setup_vpa(cfg, kube_provider, depends_on, base_tags):
+    values = {
+        component: addon_pod_values(cfg, f"vpa-{resources_key}", "system-cluster-critical")
+        for component, resources_key in (
+            ("recommender", "recommender"),
+            ("updater", "updater"),
+            ("admissionController", "admission-controller"),
+        )
+    }
+    return k8s.helm.v3.Chart(
+        "vpa",
+        k8s.helm.v3.ChartOpts(
+            chart="vpa",
+            version=cfg["vpa_chart_version"],
+            fetch_opts=k8s.helm.v3.FetchOpts(
+                repo="https://charts.fairwinds.com/stable"
+            ),
+            namespace="kube-system",
+            values=deep_merge(deep_merge(values, image_values(cfg, "vpa")), cfg["vpa_values"]),
         ),
-        opts=ResourceOptions(provider=kube_provider, depends_on=[node_group]),
-    )
\ No newline at end of file
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
+    )
+
+
+# Static busybox copied into each pre-pull pod so the pulled image itself
+# never has to ship a shell.
+PREPULL_HELPER_IMAGE = "busybox:1.36"
+PREPULL_PAUSE_IMAGE = "registry.k8s.io/pause:3.9"
+
+def setup_image_prepull(ng_cfg, kube_provider, depends_on, registry_mirrors=None):
+    """DaemonSet caching ``prepull_images`` on every node of one node group.
+
+    Scoped by the ``node-group: <name>`` label create_node_group sets. Each
+    image runs as an init container executing the helper's ``true``, so it is
+    pulled (and cached) before application pods land; the pod then idles on
+    ``pause``. Images are pulled through the ECR cache when their registry
+    is in ``registry_mirrors``.
+    """
+    registry_mirrors = registry_mirrors or {}
+    name = f"prepull-{ng_cfg['name'].lower().replace('_', '-')}"
+    labels = {"app.kubernetes.io/name": name}
+    tiny = {"requests": {"cpu": "1m", "memory": "8Mi"}, "limits": {"cpu": "50m", "memory": "32Mi"}}
+    mount = [{"name": "helper", "mountPath": "/prepull"}]
+    init_containers = [{
+        "name": "helper",
+        "image": mirror_image(PREPULL_HELPER_IMAGE, registry_mirrors),
+        "command": ["cp", "/bin/busybox", "/prepull/busybox"],
+        "volumeMounts": mount,
+        "resources": tiny,
+    }]
+    for i, image in enumerate(ng_cfg["prepull_images"]):
+        init_containers.append({
+            "name": f"prepull-{i}",
+            "image": mirror_image(image, registry_mirrors),
+            "imagePullPolicy": "IfNotPresent",
+            "command": ["/prepull/busybox", "true"],
+            "volumeMounts": mount,
+            "resources": tiny,
+        })
+    return k8s.apps.v1.DaemonSet(
+        name,
+        metadata={"name": name, "namespace": "kube-system", "labels": labels},
+        spec={
+            "selector": {"matchLabels": labels},
+            "updateStrategy": {"type": "RollingUpdate", "rollingUpdate": {"maxUnavailable": "100%"}},
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {
+                    "nodeSelector": {"node-group": ng_cfg["name"]},
+                    "tolerations": [{"operator": "Exists"}],
+                    "initContainers": init_containers,
+                    "containers": [{"name": "pause", "image": mirror_image(PREPULL_PAUSE_IMAGE, registry_mirrors), "resources": tiny}],
+                    "volumes": [{"name": "helper", "emptyDir": {}}],
+                },
+            },
+        },
+        opts=ResourceOptions(provider=kube_provider, depends_on=depends_on),
+    )
@@ -1,9 +1,13 @@
 import base64
 import json
+import re
 import pulumi
 from pulumi import ResourceOptions
 import pulumi_aws as aws
 import pulumi_kubernetes as k8s
+from validate import instance_type_arch_error
+import eks_token
+
 
 def build_base_tags(cfg):
     return {
@@ -66,19 +70,126 @@ def create_cluster_log_group(cfg, base_tags):
     )
 
 def validate_instance_type_arch_pair(instance_type, arch):
-    family = instance_type.split(".")[0]
-    arm_families = ("c6g","c7g","m6g","m7g","r6g","r7g","t4g","x2g","a1")
-    is_arm = (family in arm_families) or (family.endswith("g") and family not in ("g5","g4dn"))
-    if arch == "arm64" and not is_arm:
-        raise Exception(f"{instance_type} not ARM")
-    if arch == "x86_64" and is_arm:
-        raise Exception(f"{instance_type} is ARM family")
-
-def create_launch_template(name, node_group_sg, ssh_keypair_name, cluster_name, ami_id, base_tags, ami_family, user_supplied_ami):
-    user_data_encoded = None
-    if user_supplied_ami and ami_family == "al2":
-        user_data = f"#!/bin/bash\n/etc/eks/bootstrap.sh {cluster_name}"
-        user_data_encoded = base64.b64encode(user_data.encode()).decode()
+    msg = instance_type_arch_error(instance_type, arch)
+    if msg:
+        raise Exception(msg)
+
+def _al2_soci_script(soci, architecture):
+    """Shell lines installing the SOCI snapshotter and making it containerd's CRI snapshotter.
+
+    Best effort: any failure leaves the default snapshotter in place so the
+    node still joins. The download is skipped when the binaries are baked
+    into the AMI; ``soci["url"]`` can point at an in-region copy of the
+    release tarball and ``soci["sha256"]`` pins its checksum. Edits the
+    template bootstrap.sh copies to /etc/containerd/config.toml.
+    """
+    arch = "arm64" if architecture == "arm64" else "amd64"
+    version = soci["version"]
+    url = soci.get("url") or (
+        f"https://github.com/awslabs/soci-snapshotter/releases/download/v{version}"
+        f"/soci-snapshotter-{version}-linux-{arch}.tar.gz"
+    )
+    config = "/etc/eks/containerd/containerd-config.toml"
+    verify = [f'  echo "{soci["sha256"]}  /tmp/soci.tar.gz" | sha256sum -c - || return 1'] if soci.get("sha256") else []
+    return [
+        "install_soci() {",
+        "  if [ ! -x /usr/local/bin/soci-snapshotter-grpc ]; then",
+        f"    curl -fsSL --retry 2 --connect-timeout 5 --max-time 60 -o /tmp/soci.tar.gz {url} || return 1",
+        *["  " + line for line in verify],
+        "    tar -xzf /tmp/soci.tar.gz -C /usr/local/bin soci-snapshotter-grpc soci || return 1",
+        "  fi",
+        "  cat > /etc/systemd/system/soci-snapshotter.service <<'EOF'",
+        "[Unit]",
+        "Description=SOCI snapshotter",
+        "Before=containerd.service",
+        "[Service]",
+        "Type=notify",
+        "ExecStart=/usr/local/bin/soci-snapshotter-grpc",
+        "Restart=always",
+        "[Install]",
+        "WantedBy=multi-user.target",
+        "EOF",
+        "  systemctl daemon-reload || return 1",
+        "  systemctl enable --now soci-snapshotter || return 1",
+        f"  cat >> {config} <<'EOF'",
+        "",
+        "[proxy_plugins.soci]",
+        '  type = "snapshot"',
+        '  address = "/run/soci-snapshotter-grpc/soci-snapshotter-grpc.sock"',
+        "EOF",
+        "  sed -i '/^\\[plugins.\"io.containerd.grpc.v1.cri\".containerd\\]/a "
+        f"snapshotter = \"soci\"\\ndisable_snapshot_annotations = false' {config}",
+        "}",
+        'install_soci || echo "SOCI snapshotter unavailable, keeping the default snapshotter" >&2',
+    ]
+
+def _bottlerocket_settings(cluster_name, endpoint, ca_data, soci=False):
+    """Bottlerocket TOML settings; the cluster settings are required as the AMI is pinned."""
+    lines = [
+        "[settings.kubernetes]",
+        f'cluster-name = "{cluster_name}"',
+        f'api-server = "{endpoint}"',
+        f'cluster-certificate = "{ca_data}"',
+    ]
+    if soci:
+        lines += ["", "[settings.container-runtime]", 'snapshotter = "soci"']
+    return "\n".join(lines) + "\n"
+
+def build_user_data(
+    cluster_name,
+    ami_family,
+    user_supplied_ami,
+    cluster=None,
+    soci=None,
+    architecture="x86_64",
+):
+    """Base64 node user data (a str or an Output), or None when the defaults suffice.
+
+    The launch template always pins an AMI, so EKS does not merge in its own
+    bootstrap: whenever we emit user data it has to join the node itself.
+    ``soci`` (``version``, optional ``url``/``sha256``) enables the SOCI
+    snapshotter for lazy image loading.
+    """
+    encode = lambda text: base64.b64encode(text.encode()).decode()
+    if ami_family == "al2":
+        if not (user_supplied_ami or soci):
+            return None
+        lines = ["#!/bin/bash", "set -euo pipefail"]
+        if soci:
+            lines += _al2_soci_script(soci, architecture)
+        lines.append(f"/etc/eks/bootstrap.sh {cluster_name}")
+        return encode("\n".join(lines))
+    if ami_family == "bottlerocket" and soci:
+        if cluster is None:
+            raise Exception("Bottlerocket node settings need the cluster endpoint")
+        return pulumi.Output.all(cluster.endpoint, cluster.certificate_authority.data).apply(
+            lambda args: encode(_bottlerocket_settings(
+                cluster_name, args[0], args[1], soci=True,
+            ))
+        )
+    return None
+
+def create_launch_template(
+    name,
+    node_group_sg,
+    ssh_keypair_name,
+    cluster_name,
+    ami_id,
+    base_tags,
+    ami_family,
+    user_supplied_ami,
+    cluster=None,
+    soci=None,
+    architecture="x86_64",
+):
+    user_data_encoded = build_user_data(
+        cluster_name,
+        ami_family,
+        user_supplied_ami,
+        cluster,
+        soci,
+        architecture,
+    )
     kwargs = {
         "vpc_security_group_ids": [node_group_sg.id],
         "key_name": ssh_keypair_name if ssh_keypair_name else None,
@@ -122,6 +233,47 @@ def create_eks_cluster(cfg, eks_role, eks_sg, subnet_ids, kms_key, base_tags, lo
         opts=ResourceOptions(depends_on=[log_group] if log_group else None),
     )
 
+def split_capacity(total, parts):
+    """Split ``total`` into ``parts`` near-equal integers, remainder to the first ones."""
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+def zonal_placements(name, cfg_ng, az_subnet_map):
+    """``(group name, az, subnet ids, (desired, min, max))`` per AZ of a ``zonal: true`` group.
+
+    Each bound is split with ``split_capacity``, so the per-AZ groups add up
+    to the configured ones.
+    """
+    azs = cfg_ng.get("subnet_azs") or list(az_subnet_map)
+    if cfg_ng["max_capacity"] < len(azs):
+        raise Exception(f"NodeGroup {name}: zonal max_capacity {cfg_ng['max_capacity']} < {len(azs)} AZs")
+    return [
+        (f"{name}-{az}", az, [az_subnet_map[az]], capacity)
+        for az, capacity in zip(azs, zip(
+            split_capacity(cfg_ng["desired_capacity"], len(azs)),
+            split_capacity(cfg_ng["min_capacity"], len(azs)),
+            split_capacity(cfg_ng["max_capacity"], len(azs)),
+        ))
+    ]
+
+def live_desired_size(cluster_name, name_prefix):
+    """Current desired size of the node group created from ``name_prefix``, or None.
+
+    Blue/green replacements start at this size, so a group cluster-autoscaler
+    has grown is not shrunk back to the configured ``desired_capacity`` when
+    the old group is deleted. None when the cluster or group doesn't exist yet.
+    """
+    try:
+        names = aws.eks.get_node_groups(cluster_name=cluster_name).names
+    except Exception:
+        return None
+    pattern = re.compile(re.escape(name_prefix) + r"[0-9a-f]{26}")
+    sizes = [
+        aws.eks.get_node_group(cluster_name=cluster_name, node_group_name=n).scaling_configs[0].desired_size
+        for n in names if pattern.fullmatch(n)
+    ]
+    return max(sizes) if sizes else None
+
 def create_node_group(
     name,
     cluster_name,
@@ -133,17 +285,42 @@ def create_node_group(
     cluster,
     base_tags,
 ):
-    if cfg_ng.get("subnet_ids"):
-        subnet_ids = cfg_ng["subnet_ids"]
-    elif cfg_ng.get("subnet_azs"):
+    """Create the managed node group(s) for one ``node_groups`` entry.
+
+    Returns a list: a single multi-AZ group, or with ``zonal: true`` one group
+    per AZ (named ``<name>-<az>``) sharing labels and taints, with the
+    capacity split between them so cluster-autoscaler can scale the AZ a
+    pending pod's volume lives in.
+
+    The launch template is pinned to its ``latest_version`` so template
+    drift shows up in previews. ``max_unavailable``/``max_unavailable_percentage``
+    set how many nodes a rolling update replaces at once. With
+    ``update_strategy: blue_green`` a template or instance type change
+    replaces the group instead: Pulumi creates the new group (named from a
+    prefix so both can coexist), waits for it to go ACTIVE, then deletes the
+    old one, which EKS cordons and drains. The new group starts at the old
+    group's live desired size (see ``live_desired_size``), clamped to
+    ``max_capacity``, so the cutover does not lose capacity.
+    """
+    if cfg_ng.get("subnet_azs"):
         missing = [az for az in cfg_ng["subnet_azs"] if az not in az_subnet_map]
         if missing:
             raise Exception(f"NodeGroup {name} unknown AZ(s): {missing}")
-        subnet_ids = [az_subnet_map[az] for az in cfg_ng["subnet_azs"]]
-    else:
-        subnet_ids = global_subnet_ids
     if not (cfg_ng["min_capacity"] <= cfg_ng["desired_capacity"] <= cfg_ng["max_capacity"]):
         raise Exception(f"Capacity invalid for {name}")
+
+    if cfg_ng.get("zonal"):
+        placements = zonal_placements(name, cfg_ng, az_subnet_map)
+    else:
+        if cfg_ng.get("subnet_ids"):
+            subnet_ids = cfg_ng["subnet_ids"]
+        elif cfg_ng.get("subnet_azs"):
+            subnet_ids = [az_subnet_map[az] for az in cfg_ng["subnet_azs"]]
+        else:
+            subnet_ids = global_subnet_ids
+        capacity = (cfg_ng["desired_capacity"], cfg_ng["min_capacity"], cfg_ng["max_capacity"])
+        placements = [(name, None, subnet_ids, capacity)]
+
     taints_args = [
         aws.eks.NodeGroupTaintArgs(
             key=t["key"],
@@ -153,35 +330,102 @@ def create_node_group(
         for t in cfg_ng.get("taints", [])
     ]
     labels = {**cfg_ng.get("labels", {}), "node-group": name}
-    tags = {
-        **base_tags,
-        "Name": f"eks-ng-{name}",
-        "k8s.io/cluster-autoscaler/enabled": "true",
-        f"k8s.io/cluster-autoscaler/{cluster_name}": "owned",
+    update_config = None
+    if cfg_ng.get("max_unavailable") or cfg_ng.get("max_unavailable_percentage"):
+        update_config = aws.eks.NodeGroupUpdateConfigArgs(
+            max_unavailable=cfg_ng.get("max_unavailable"),
+            max_unavailable_percentage=cfg_ng.get("max_unavailable_percentage"),
+        )
+    blue_green = cfg_ng.get("update_strategy") == "blue_green"
+    lt_version = lt.latest_version.apply(str)
+    node_groups = []
+    for ng_name, az, subnet_ids, (desired, min_c, max_c) in placements:
+        tags = {
+            **base_tags,
+            "Name": f"eks-ng-{ng_name}",
+            "k8s.io/cluster-autoscaler/enabled": "true",
+            f"k8s.io/cluster-autoscaler/{cluster_name}": "owned",
+        }
+        if blue_green:
+            name_args = {"node_group_name_prefix": f"{ng_name}-"}
+            live = live_desired_size(cluster_name, f"{ng_name}-")
+            if live is not None:
+                desired = min(max(desired, live), max_c)
+            opts = ResourceOptions(
+                depends_on=[cluster],
+                replace_on_changes=["launchTemplate", "instanceTypes"],
+                delete_before_replace=False,
+            )
+        else:
+            name_args = {"node_group_name": ng_name}
+            opts = ResourceOptions(depends_on=[cluster])
+        ng = aws.eks.NodeGroup(
+            f"ng-{ng_name}",
+            cluster_name=cluster.name,
+            **name_args,
+            node_role_arn=node_group_role.arn,
+            subnet_ids=subnet_ids,
+            scaling_config=aws.eks.NodeGroupScalingConfigArgs(
+                desired_size=desired,
+                min_size=min_c,
+                max_size=max_c,
+            ),
+            instance_types=[cfg_ng["instance_type"]],
+            labels=labels,
+            taints=taints_args or None,
+            launch_template=aws.eks.NodeGroupLaunchTemplateArgs(
+                id=lt.id,
+                version=lt_version,
+            ),
+            update_config=update_config,
+            tags=tags,
+            opts=opts,
+        )
+        if az:
+            # cluster-autoscaler reads node-template hints from the ASG, and EKS
+            # does not copy node group tags to it: tag the generated ASG directly
+            # so scale-up from zero knows which zone the group's nodes land in.
+            aws.autoscaling.Tag(
+                f"ng-{ng_name}-zone-template",
+                autoscaling_group_name=ng.resources.apply(lambda r: r[0].autoscaling_groups[0].name),
+                tag=aws.autoscaling.TagTagArgs(
+                    key="k8s.io/cluster-autoscaler/node-template/label/topology.kubernetes.io/zone",
+                    value=az,
+                    propagate_at_launch=False,
+                ),
+            )
+        node_groups.append(ng)
+    return node_groups
+
+def _kube_user(auth, cluster_name, region, token_ttl):
+    """kubeconfig user entry for one of the ``kube_auth`` modes."""
+    if auth == "token":
+        # A stable path, so the provider's inputs don't change between runs.
+        return {"tokenFile": eks_token.token_file(cluster_name, region)}
+    if auth == "cached-exec":
+        # Resolved through sys.path: the project dir during a pulumi run,
+        # PYTHONPATH=<checkout> for an exported kubeconfig.
+        command, args = "python3", [
+            "-m", "eks_token", "--cluster-name", cluster_name, "--region", region, "--ttl", str(token_ttl),
+        ]
+    else:
+        command, args = "aws", ["eks", "get-token", "--cluster-name", cluster_name]
+    return {
+        "exec": {
+            "apiVersion": "client.authentication.k8s.io/v1",
+            "command": command,
+            "args": args,
+        }
     }
-    return aws.eks.NodeGroup(
-        f"ng-{name}",
-        cluster_name=cluster.name,
-        node_group_name=name,
-        node_role_arn=node_group_role.arn,
-        subnet_ids=subnet_ids,
-        scaling_config=aws.eks.NodeGroupScalingConfigArgs(
-            desired_size=cfg_ng["desired_capacity"],
-            min_size=cfg_ng["min_capacity"],
-            max_size=cfg_ng["max_capacity"],
-        ),
-        instance_types=[cfg_ng["instance_type"]],
-        labels=labels,
-        taints=taints_args or None,
-        launch_template=aws.eks.NodeGroupLaunchTemplateArgs(
-            id=lt.id,
-            version="$Latest",
-        ),
-        tags=tags,
-        opts=ResourceOptions(depends_on=[cluster]),
-    )
 
-def build_kubeconfig(cluster, cluster_name):
+def build_kubeconfig(cluster, cluster_name, auth="exec", region=None, token_ttl=eks_token.DEFAULT_TOKEN_TTL):
+    """Kubeconfig for the cluster.
+
+    ``auth`` is ``exec`` (``aws eks get-token``), ``cached-exec`` (the
+    eks_token.py helper, whose on-disk tokens live ``token_ttl`` seconds) or
+    ``token`` (a token file signed in-process by ``create_kube_provider``;
+    only meaningful on the machine running the program, never for export).
+    """
     return pulumi.Output.all(
         cluster.endpoint,
         cluster.certificate_authority.data,
@@ -203,13 +447,7 @@ def build_kubeconfig(cluster, cluster_name):
         "kind": "Config",
         "users": [{
             "name": "aws",
-            "user": {
-                "exec": {
-                    "apiVersion": "client.authentication.k8s.io/v1",
-                    "command": "aws",
-                    "args": ["eks", "get-token", "--cluster-name", args[2]],
-                }
-            },
+            "user": _kube_user(auth, args[2], region, token_ttl),
         }],
     }))
 
@@ -227,8 +465,10 @@ def create_managed_addons(cfg, cluster, base_tags):
             kwargs["addon_version"] = ver
         aws.eks.Addon(f"addon-{addon_name}", **kwargs, opts=ResourceOptions(depends_on=[cluster]))
 
-def create_kube_provider(cluster, cluster_name):
+def create_kube_provider(cluster, cluster_name, auth="exec", region=None, token_ttl=eks_token.DEFAULT_TOKEN_TTL):
+    if auth == "token":
+        eks_token.keep_token_file(cluster_name, region, token_ttl)
     return k8s.Provider(
         "k8s-provider",
-        kubeconfig=build_kubeconfig(cluster, cluster_name),
+        kubeconfig=build_kubeconfig(cluster, cluster_name, auth, region, token_ttl),
     )
\ No newline at end of file
@@ -1,114 +1,30 @@
+from contextvars import ContextVar
+
 import pulumi
 from pulumi import Config
+from pulumi.runtime import config as runtime_config
 
+from validate import NAMESPACE, validate
 
-def load_config():
-    """Load and validate stack configuration."""
-    cfg = Config("eks-cluster")
-    aws_region = pulumi.Config("aws").get("region") or "us-west-2"
-
-    def get_bool(key, default):
-        v = cfg.get_bool(key)
-        return default if v is None else v
-
-    environment = cfg.get("environment") or "dev"
 
-    cluster_del_prot = cfg.get_bool("cluster_deletion_protection")
-    if cluster_del_prot is None:
-        cluster_del_prot = environment == "prod"
+def _config_keys():
+    """Every ``eks-cluster:*`` key set on the stack, including ones the schema doesn't know."""
+    config = runtime_config.CONFIG
+    # A ContextVar holding the config dict in current Pulumi 3.x, a plain dict in older releases.
+    if isinstance(config, ContextVar):
+        config = config.get()
+    keys = set(config or {}) | set(runtime_config.get_config_env())
+    prefix = f"{NAMESPACE}:"
+    return sorted(k[len(prefix):] for k in keys if k.startswith(prefix))
 
-    efs_del_prot = cfg.get_bool("efs_deletion_protection")
-    if efs_del_prot is None:
-        efs_del_prot = environment == "prod"
 
-    node_groups_raw = cfg.get_object("node_groups")
-    if not node_groups_raw or not isinstance(node_groups_raw, list):
-        raise Exception("'node_groups' must be a non-empty list.")
-
-    seen = set()
-    node_groups = []
-    for i, ng in enumerate(node_groups_raw):
-        if not isinstance(ng, dict):
-            raise Exception(f"node_groups[{i}] must be an object")
-        name = ng.get("name") or f"node-group-{i}"
-        if name in seen:
-            raise Exception(f"Duplicate node group name '{name}'")
-        seen.add(name)
-        itype = ng.get("instance_type")
-        if not itype:
-            raise Exception(f"node_groups[{i}] missing instance_type")
-        desired = ng.get("desired_capacity")
-        min_c = ng.get("min_capacity")
-        max_c = ng.get("max_capacity")
-        if any(v is None for v in (desired, min_c, max_c)):
-            raise Exception(f"node_groups[{i}] must set desired_capacity,min_capacity,max_capacity")
-        if not (min_c <= desired <= max_c):
-            raise Exception(f"Capacity invalid for node_groups[{i}]")
-        taints_cfg = ng.get("taints") or []
-        taints_norm = []
-        for t_idx, t in enumerate(taints_cfg):
-            if "key" not in t or "effect" not in t:
-                raise Exception(f"node_groups[{i}].taints[{t_idx}] needs key/effect")
-            taints_norm.append({
-                "key": t["key"],
-                "value": t.get("value"),
-                "effect": t["effect"].upper(),
-            })
-        subnet_ids = ng.get("subnet_ids")
-        subnet_azs = ng.get("subnet_azs")
-        if subnet_ids and subnet_azs:
-            raise Exception(f"node_groups[{i}]: choose subnet_ids OR subnet_azs")
-        node_groups.append({
-            "name": name,
-            "instance_type": itype,
-            "desired_capacity": desired,
-            "min_capacity": min_c,
-            "max_capacity": max_c,
-            "architecture": ng.get("architecture") or "x86_64",
-            "ami_family": ng.get("ami_family") or "al2",
-            "ami_id": ng.get("ami_id"),
-            "ssh_keypair_name": ng.get("ssh_keypair_name"),
-            "labels": ng.get("labels") or {},
-            "taints": taints_norm,
-            "subnet_ids": subnet_ids,
-            "subnet_azs": subnet_azs,
-        })
-
-    max_azs = cfg.get_int("max_azs")
-    if max_azs is not None and max_azs <= 0:
-        raise Exception("max_azs must be > 0")
-
-    return {
-        "environment": environment,
-        "owner": cfg.get("owner") or "team-platform",
-        "cost_center": cfg.get("cost_center") or "shared",
-        "cluster_name": cfg.get("cluster_name") or "eks-cluster",
-        "region": aws_region,
-        "cluster_version": cfg.get("cluster_version") or "1.30",
-        "cluster_log_types": cfg.get_object("cluster_log_types") or ["api","audit","authenticator","controllerManager","scheduler"],
-        "log_retention_days": cfg.get_int("log_retention_days") or 30,
-        "public_access": get_bool("public_access", False),
-        "private_access": get_bool("private_access", True),
-        "public_access_cidrs": cfg.get_object("public_access_cidrs") or ["0.0.0.0/0"],
-        "trusted_cidrs": cfg.get_object("trusted_cidrs") or [],
-        "enable_efs": get_bool("enable_efs", False),
-        "enable_ebs": get_bool("enable_ebs", False),
-        "enable_prometheus": get_bool("enable_prometheus", False),
-        "enable_ingress": get_bool("enable_ingress", False),
-        "enable_managed_addons": get_bool("enable_managed_addons", True),
-        "enable_kms_encryption": get_bool("enable_kms_encryption", True),
-        "efs_csi_driver_version": cfg.get("efs_csi_driver_version") or "2.5.0",
-        "ebs_csi_driver_version": cfg.get("ebs_csi_driver_version") or "2.26.1",
-        "ingress_nginx_version": cfg.get("ingress_nginx_version") or "4.10.0",
-        "prometheus_stack_version": cfg.get("prometheus_stack_version") or "55.5.0",
-        "autoscaler_chart_version": cfg.get("autoscaler_chart_version") or "9.29.0",
-        "ingress_nginx_values": cfg.get_object("ingress_nginx_values") or {"controller": {"service": {"type": "LoadBalancer"}}},
-        "prometheus_stack_values": cfg.get_object("prometheus_stack_values") or {"prometheus": {"service": {"type": "ClusterIP"}}},
-        "cluster_deletion_protection": cluster_del_prot,
-        "efs_deletion_protection": efs_del_prot,
-        "vpc_cidr": cfg.get("vpc_cidr") or "10.100.0.0/16",
-        "oidc_thumbprint": cfg.get("oidc_thumbprint") or "9e99a48a9960b14926bb7f3b02e22da0ecd2e9d0",
-        "addon_versions": cfg.get_object("addon_versions") or {"vpc-cni": None, "kube-proxy": None, "coredns": None},
-        "node_groups": node_groups,
-        "max_azs": max_azs,
-    }
\ No newline at end of file
+def load_config():
+    """Load and validate stack configuration.
+
+    Validation lives in ``validate.py`` so it can also run offline against
+    ``Pulumi.<stack>.yaml``; raises ``validate.ConfigError`` listing every problem.
+    """
+    cfg = Config(NAMESPACE)
+    aws_region = pulumi.Config("aws").get("region")
+    raw = {key: cfg.get(key) for key in _config_keys()}
+    return validate({k: v for k, v in raw.items() if v is not None}, aws_region)
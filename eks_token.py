@@ -0,0 +1,191 @@
+"""EKS bearer tokens generated in-process instead of by ``aws eks get-token``.
+
+A token is an STS ``GetCallerIdentity`` URL presigned for the cluster,
+which EKS accepts for 15 minutes. The Pulumi program signs tokens for the
+Kubernetes provider in-process into a kubeconfig ``tokenFile``
+(``keep_token_file``). Run as a module this is a kubectl exec credential
+helper that caches tokens on disk per AWS identity, so repeated kubectl/helm
+calls skip the signing until the token is close to expiry. The checkout
+must be importable (the cwd during a pulumi run)::
+
+    PYTHONPATH=/path/to/eks-py python3 -m eks_token --cluster-name my-eks-cluster --region us-west-2
+
+``--token-file`` instead refreshes the provider's token file, which
+``pulumi destroy`` / ``pulumi refresh`` need since they don't run the program.
+"""
+import argparse
+import base64
+import configparser
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+TOKEN_PREFIX = "k8s-aws-v1."
+# EKS rejects tokens signed more than 15 minutes ago.
+MAX_TOKEN_TTL = 900
+DEFAULT_TOKEN_TTL = 840
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".kube", "cache", "eks-py")
+# Environment variables and profile settings that select the AWS identity.
+IDENTITY_ENV = ("AWS_ACCESS_KEY_ID", "AWS_ROLE_ARN", "AWS_CONTAINER_CREDENTIALS_FULL_URI",
+                "AWS_CONTAINER_CREDENTIALS_RELATIVE_URI")
+IDENTITY_SETTINGS = ("role_arn", "source_profile", "credential_source", "web_identity_token_file",
+                     "sso_session", "sso_account_id", "sso_role_name", "credential_process", "aws_access_key_id")
+
+
+def generate_token(cluster_name, region):
+    """Presign an STS GetCallerIdentity request scoped to ``cluster_name``."""
+    import botocore.session
+    from botocore.signers import RequestSigner
+
+    session = botocore.session.get_session()
+    credentials = session.get_credentials()
+    if credentials is None:
+        raise Exception("No AWS credentials found for signing an EKS token")
+    sts = session.create_client("sts", region_name=region)
+    signer = RequestSigner(
+        sts.meta.service_model.service_id,
+        region,
+        "sts",
+        "v4",
+        credentials,
+        session.get_component("event_emitter"),
+    )
+    url = signer.generate_presigned_url(
+        {
+            "method": "GET",
+            "url": f"https://sts.{region}.amazonaws.com/?Action=GetCallerIdentity&Version=2011-06-15",
+            "body": {},
+            "headers": {"x-k8s-aws-id": cluster_name},
+            "context": {},
+        },
+        region_name=region,
+        expires_in=60,
+        operation_name="",
+    )
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(url.encode()).decode().rstrip("=")
+
+
+def _identity():
+    """What selects the AWS identity, read without resolving credentials.
+
+    Resolving them can mean an STS or SSO call for assume-role and SSO
+    profiles, which costs more than the signing the cache saves. The
+    environment and the profile's settings in the shared config and
+    credentials files pick the identity, so they key the cache instead.
+    """
+    profile = os.environ.get("AWS_PROFILE") or os.environ.get("AWS_DEFAULT_PROFILE") or "default"
+    parts = [profile] + [os.environ.get(k, "") for k in IDENTITY_ENV]
+    files = (
+        (os.environ.get("AWS_CONFIG_FILE", "~/.aws/config"), profile if profile == "default" else f"profile {profile}"),
+        (os.environ.get("AWS_SHARED_CREDENTIALS_FILE", "~/.aws/credentials"), profile),
+    )
+    for path, section in files:
+        parser = configparser.RawConfigParser()
+        try:
+            parser.read(os.path.expanduser(path))
+        except configparser.Error:
+            continue
+        if parser.has_section(section):
+            parts += [parser.get(section, k, fallback="") for k in IDENTITY_SETTINGS]
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:16]
+
+
+def _cache_path(cluster_name, region):
+    return os.path.join(CACHE_DIR, f"{_identity()}-{region}-{cluster_name}.json")
+
+
+def _write_private(path, text):
+    """Atomically replace ``path`` with a 0600 file holding ``text``."""
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def cached_token(cluster_name, region, ttl=DEFAULT_TOKEN_TTL):
+    """Return ``(token, expires_at)``, shared across processes through a 0600 file.
+
+    A cached token is reused until ``ttl`` seconds (at most 15 minutes)
+    after it was signed; a hit needs neither botocore nor credentials.
+    """
+    path = _cache_path(cluster_name, region)
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        if entry["expires_at"] > time.time():
+            return entry["token"], entry["expires_at"]
+    except (OSError, ValueError, KeyError):
+        pass
+    token = generate_token(cluster_name, region)
+    expires_at = time.time() + min(ttl, MAX_TOKEN_TTL)
+    _write_private(path, json.dumps({"token": token, "expires_at": expires_at}))
+    return token, expires_at
+
+
+def token_file(cluster_name, region):
+    """Bearer token file the Kubernetes provider reads in ``kube_auth: token`` mode."""
+    return os.path.join(CACHE_DIR, f"{region}-{cluster_name}.token")
+
+
+def write_token_file(cluster_name, region):
+    """Sign a fresh token into ``token_file``; returns its path."""
+    path = token_file(cluster_name, region)
+    _write_private(path, generate_token(cluster_name, region))
+    return path
+
+
+def keep_token_file(cluster_name, region, ttl=DEFAULT_TOKEN_TTL):
+    """``write_token_file`` now, then again every ``ttl / 2`` seconds while the program runs.
+
+    client-go re-reads a kubeconfig ``tokenFile`` every minute, so the
+    provider never holds a token older than the 15 minutes EKS accepts,
+    however long the update takes.
+    """
+    path = write_token_file(cluster_name, region)
+    interval = min(ttl, MAX_TOKEN_TTL) / 2
+
+    def refresh():
+        while True:
+            time.sleep(interval)
+            try:
+                write_token_file(cluster_name, region)
+            except Exception as e:  # keep the last token; it may outlive a transient failure
+                print(f"eks_token: refreshing {path} failed: {e}", file=sys.stderr)
+
+    threading.Thread(target=refresh, name="eks-token-refresh", daemon=True).start()
+    return path
+
+
+def exec_credential(token, expires_at):
+    """kubectl ExecCredential; the expiry lets client-go reuse it within a process."""
+    expiry = datetime.fromtimestamp(expires_at, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return {
+        "kind": "ExecCredential",
+        "apiVersion": "client.authentication.k8s.io/v1",
+        "spec": {},
+        "status": {"expirationTimestamp": expiry, "token": token},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="kubectl exec credential helper for EKS with a token cache.")
+    parser.add_argument("--cluster-name", required=True)
+    parser.add_argument("--region", required=True)
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TOKEN_TTL, help=f"seconds, at most {MAX_TOKEN_TTL}")
+    parser.add_argument("--token-file", action="store_true", help="refresh the kube_auth: token provider's token file")
+    args = parser.parse_args(argv)
+    if args.token_file:
+        print(write_token_file(args.cluster_name, args.region))
+        return 0
+    print(json.dumps(exec_credential(*cached_token(args.cluster_name, args.region, args.ttl))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,230 @@
+"""Run preview/up/refresh across many stacks of this project in parallel.
+
+Built on the Pulumi Automation API. A fleet file lists the stacks and the
+config each one overrides on top of its ``Pulumi.<stack>.yaml``::
+
+    concurrency: 4                        # stacks in flight at once
+    backend_url: file://~/.pulumi-fleet   # optional; default is the logged-in backend
+    secrets_provider: passphrase          # optional, for newly created stacks
+    defaults:                             # applied to every stack
+      environment: prod
+      owner:
+        secret: plaintext-value           # stored encrypted in the stack
+    stacks:
+      - name: prod-usw2
+        config:
+          aws:region: us-west-2
+          cluster_name: prod-usw2         # unqualified keys mean eks-cluster:<key>
+      - name: prod-euw1
+        config:
+          aws:region: eu-west-1
+          cluster_name: prod-euw1
+
+Secret values are given in plaintext under ``secret:``; ``secure:`` values
+(ciphertext copied from a stack file) are rejected because they only decrypt
+with their own stack's secrets provider. Every stack's merged config is
+checked with ``validate.py`` before any stack is touched, and each stack runs
+in a temporary copy of the project so the overrides never end up in the
+checked-in ``Pulumi.<stack>.yaml``. Usage::
+
+    python fleet.py fleet.yaml preview
+    python fleet.py fleet.yaml up --concurrency 8
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from validate import NAMESPACE, ConfigError, read_stack_file, validate
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+OPERATIONS = ("preview", "up", "refresh")
+# Not copied into a stack's temporary work_dir.
+WORK_DIR_IGNORE = shutil.ignore_patterns(".git", "__pycache__", ".pytest_cache", "venv", ".venv", "tests")
+
+
+def _is_secret(value):
+    return isinstance(value, dict) and set(value) == {"secret"}
+
+
+def load_fleet(path):
+    import yaml
+
+    with open(path) as f:
+        fleet = yaml.safe_load(f) or {}
+    stacks = fleet.get("stacks")
+    if not stacks or not isinstance(stacks, list):
+        raise Exception(f"{path}: 'stacks' must be a non-empty list")
+    names = [s.get("name") for s in stacks]
+    if not all(names) or len(set(names)) != len(names):
+        raise Exception(f"{path}: every stack needs a unique name")
+    return fleet
+
+
+def qualify(key):
+    """``cluster_name`` -> ``eks-cluster:cluster_name``; qualified keys pass through."""
+    return key if ":" in key else f"{NAMESPACE}:{key}"
+
+
+def stack_config(fleet, stack):
+    """Config overrides for one stack: fleet defaults, then the stack's own."""
+    merged = {qualify(k): v for k, v in (fleet.get("defaults") or {}).items()}
+    merged.update({qualify(k): v for k, v in (stack.get("config") or {}).items()})
+    return merged
+
+
+def validate_fleet(fleet, project_dir=PROJECT_DIR):
+    """Validate every stack's merged config offline; returns {stack: [errors]}."""
+    problems = {}
+    for stack in fleet["stacks"]:
+        errors = [
+            f"{key}: secure values are not supported in fleet files, use secret: <plaintext>"
+            for key, value in stack_config(fleet, stack).items()
+            if isinstance(value, dict) and set(value) == {"secure"}
+        ]
+        path = os.path.join(project_dir, f"Pulumi.{stack['name']}.yaml")
+        raw, region = read_stack_file(path) if os.path.isfile(path) else ({}, None)
+        for key, value in stack_config(fleet, stack).items():
+            ns, _, name = key.partition(":")
+            if _is_secret(value):
+                value = value["secret"]
+            if ns == NAMESPACE:
+                raw[name] = value
+            elif key == "aws:region":
+                region = value
+        try:
+            validate(raw, region)
+        except ConfigError as e:
+            errors += e.errors
+        if errors:
+            problems[stack["name"]] = errors
+    return problems
+
+
+def _config_value(value):
+    from pulumi import automation as auto
+
+    if _is_secret(value):
+        return auto.ConfigValue(value=_config_value(value["secret"]).value, secret=True)
+    if isinstance(value, str):
+        return auto.ConfigValue(value=value)
+    # Objects and scalars the way ``pulumi config set`` stores them.
+    return auto.ConfigValue(value=json.dumps(value))
+
+
+@contextlib.contextmanager
+def default_stack_factory(fleet, stack, project_dir=PROJECT_DIR):
+    """Select (or create) the stack in a temporary copy of the project and apply its overrides.
+
+    ``set_all_config`` writes to the work_dir's ``Pulumi.<stack>.yaml``; the
+    copy keeps the overrides out of the checked-in file. A newly created
+    stack's file is copied back before any override is written, so its
+    secrets provider settings (e.g. the passphrase salt) are kept.
+    """
+    from pulumi import automation as auto
+
+    env_vars = {}
+    if fleet.get("backend_url"):
+        env_vars["PULUMI_BACKEND_URL"] = os.path.expanduser(fleet["backend_url"])
+    stack_file = f"Pulumi.{stack['name']}.yaml"
+    existed = os.path.exists(os.path.join(project_dir, stack_file))
+    with tempfile.TemporaryDirectory(prefix=f"fleet-{stack['name']}-") as tmp:
+        work_dir = os.path.join(tmp, "project")
+        shutil.copytree(project_dir, work_dir, ignore=WORK_DIR_IGNORE)
+        ws_opts = auto.LocalWorkspaceOptions(env_vars=env_vars, secrets_provider=fleet.get("secrets_provider"))
+        s = auto.create_or_select_stack(stack_name=stack["name"], work_dir=work_dir, opts=ws_opts)
+        if not existed and os.path.exists(os.path.join(work_dir, stack_file)):
+            shutil.copy(os.path.join(work_dir, stack_file), os.path.join(project_dir, stack_file))
+        s.set_all_config({k: _config_value(v) for k, v in stack_config(fleet, stack).items()})
+        yield s
+
+
+def summarize(operation, result):
+    """Pick out what matters from an automation result."""
+    if operation == "up":
+        outputs = {k: v.value for k, v in result.outputs.items()}
+        cluster = outputs.get("cluster") or {}
+        return {
+            "changes": result.summary.resource_changes,
+            "cluster": cluster.get("name"),
+            "endpoint": cluster.get("endpoint"),
+            "version": cluster.get("version"),
+            "node_groups": [ng.get("name") for ng in cluster.get("node_groups") or []],
+        }
+    if operation == "preview":
+        return {"changes": result.change_summary}
+    return {"changes": result.summary.resource_changes}
+
+
+def run_fleet(fleet, operation, concurrency=None, stack_factory=default_stack_factory, out=print):
+    """Run ``operation`` on every stack with bounded concurrency; returns {stack: summary}.
+
+    ``stack_factory(fleet, stack)`` is a context manager yielding an
+    automation ``Stack`` (or anything with the same operation methods).
+
+    Each summary has ``ok`` and either the ``summarize`` fields or ``error``.
+    """
+    if operation not in OPERATIONS:
+        raise Exception(f"Unknown operation {operation}, expected one of {OPERATIONS}")
+    lock = threading.Lock()
+
+    def emit(name, line):
+        with lock:
+            out(f"[{name}] {line.rstrip()}")
+
+    def run_one(stack):
+        name = stack["name"]
+        try:
+            with stack_factory(fleet, stack) as s:
+                on_output = lambda line: emit(name, line)
+                result = getattr(s, operation)(on_output=on_output)
+            emit(name, f"{operation} done")
+            return name, {"ok": True, **summarize(operation, result)}
+        except Exception as e:  # one stack failing must not stop the fleet
+            emit(name, f"{operation} failed: {e}")
+            return name, {"ok": False, "error": str(e)}
+
+    workers = concurrency or fleet.get("concurrency") or 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(run_one, fleet["stacks"]))
+
+
+def print_summary(results, out=print):
+    out("")
+    for name, r in results.items():
+        if not r["ok"]:
+            out(f"{name:<24} FAILED  {r['error'].splitlines()[0] if r['error'] else ''}")
+            continue
+        line = f"{name:<24} ok      changes={r['changes']}"
+        if r.get("cluster"):
+            line += f" cluster={r['cluster']} version={r['version']} node_groups={r['node_groups']}"
+        out(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a Pulumi operation across a fleet of stacks.")
+    parser.add_argument("fleet_file")
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--concurrency", type=int, help="override the fleet file's concurrency")
+    args = parser.parse_args(argv)
+
+    fleet = load_fleet(args.fleet_file)
+    problems = validate_fleet(fleet)
+    if problems:
+        for name, errors in problems.items():
+            print(f"{name}: {len(errors)} config error(s)")
+            for err in errors:
+                print(f"  - {err}")
+        return 1
+    results = run_fleet(fleet, args.operation, args.concurrency)
+    print_summary(results)
+    return 0 if all(r["ok"] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
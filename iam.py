@@ -48,4 +48,21 @@ def create_eks_roles(cluster_name: str, base_tags: dict):
             role=node_group_role.name,
             policy_arn=policy
         )
-    return eks_role, node_group_role
\ No newline at end of file
+    return eks_role, node_group_role
+
+def create_pull_through_cache_policy(cluster_name: str, node_group_role, region: str, account_id: str, prefixes):
+    """Let nodes populate ECR pull-through cache repositories, scoped to the cache prefixes.
+
+    Pulling from existing repositories is already covered by AmazonEC2ContainerRegistryReadOnly.
+    """
+    return aws.iam.RolePolicy(
+        "eks-nodegroup-role-pull-through-cache",
+        name=f"{cluster_name}-pull-through-cache",
+        role=node_group_role.id,
+        policy=aws.iam.get_policy_document(statements=[
+            aws.iam.GetPolicyDocumentStatementArgs(
+                actions=["ecr:BatchImportUpstreamImage", "ecr:CreateRepository"],
+                resources=[f"arn:aws:ecr:{region}:{account_id}:repository/{prefix}/*" for prefix in prefixes],
+            )
+        ]).json,
+    )
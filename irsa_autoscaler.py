@@ -1,6 +1,7 @@
 import json
 import pulumi_aws as aws
 from pulumi import ResourceOptions
+from addons import addon_pod_values, deep_merge, image_values
 
 
 def setup_oidc(cluster, thumbprint):
@@ -98,6 +99,7 @@ def setup_autoscaler(cfg, oidc, kube_provider, node_groups, cluster_name, region
         "podAnnotations": {
             "cluster-autoscaler.kubernetes.io/safe-to-evict": "false"
         },
+        **addon_pod_values(cfg, "cluster-autoscaler", "system-cluster-critical"),
     }
     k8s.helm.v3.Chart(
         "cluster-autoscaler",
@@ -106,7 +108,7 @@ def setup_autoscaler(cfg, oidc, kube_provider, node_groups, cluster_name, region
             version=cfg["autoscaler_chart_version"],
             fetch_opts=k8s.helm.v3.FetchOpts(repo="https://kubernetes.github.io/autoscaler"),
             namespace="kube-system",
-            values=values,
+            values=deep_merge(values, image_values(cfg, "cluster-autoscaler")),
         ),
         opts=ResourceOptions(provider=kube_provider, depends_on=node_groups),
     )
\ No newline at end of file
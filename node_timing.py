@@ -0,0 +1,102 @@
+"""Report how long new nodes take to become useful.
+
+For each node: time from creation to Ready, to the node group's pre-pull
+DaemonSet pod finishing (images cached), and to the first workload pod
+running. DaemonSet pods other than pre-pull are ignored since they land on
+every node regardless of capacity.
+
+Usage (uses the current kubectl context, e.g. the exported kubeconfig)::
+
+    python node_timing.py
+    python node_timing.py --node-group general
+"""
+import argparse
+import json
+import subprocess
+import sys
+from datetime import datetime
+
+PREPULL_PREFIX = "prepull-"
+
+
+def _ts(value):
+    return datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ") if value else None
+
+
+def _owner_kind(pod):
+    refs = pod["metadata"].get("ownerReferences") or []
+    return refs[0]["kind"] if refs else None
+
+
+def _running_since(pod):
+    """Earliest container start in ``pod``, or None if nothing has started."""
+    starts = [
+        _ts(cs["state"]["running"]["startedAt"])
+        for cs in pod.get("status", {}).get("containerStatuses") or []
+        if "running" in cs.get("state", {})
+    ]
+    return min(starts) if starts else None
+
+
+def node_timings(nodes, pods):
+    """Per-node timings in seconds from ``kubectl get nodes/pods -o json`` documents."""
+    by_node = {}
+    for pod in pods["items"]:
+        node_name = pod.get("spec", {}).get("nodeName")
+        if node_name:
+            by_node.setdefault(node_name, []).append(pod)
+
+    rows = []
+    for node in nodes["items"]:
+        meta = node["metadata"]
+        created = _ts(meta["creationTimestamp"])
+        ready = next(
+            (_ts(c["lastTransitionTime"]) for c in node.get("status", {}).get("conditions") or []
+             if c["type"] == "Ready" and c["status"] == "True"),
+            None,
+        )
+        prepulled = None
+        first_pod = None
+        for pod in by_node.get(meta["name"], []):
+            started = _running_since(pod)
+            if started is None:
+                continue
+            if pod["metadata"]["name"].startswith(PREPULL_PREFIX):
+                prepulled = started if prepulled is None else min(prepulled, started)
+            elif _owner_kind(pod) != "DaemonSet":
+                first_pod = started if first_pod is None else min(first_pod, started)
+
+        def since_created(t):
+            return (t - created).total_seconds() if t else None
+
+        rows.append({
+            "node": meta["name"],
+            "node_group": meta.get("labels", {}).get("node-group"),
+            "ready": since_created(ready),
+            "prepulled": since_created(prepulled),
+            "first_pod": since_created(first_pod),
+        })
+    return rows
+
+
+def _kubectl_json(*args):
+    return json.loads(subprocess.check_output(["kubectl", *args, "-o", "json"]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report node time-to-ready and time-to-first-pod.")
+    parser.add_argument("--node-group", help="only nodes labelled node-group=<name>")
+    args = parser.parse_args(argv)
+    selector = ["-l", f"node-group={args.node_group}"] if args.node_group else []
+    rows = node_timings(_kubectl_json("get", "nodes", *selector), _kubectl_json("get", "pods", "-A"))
+
+    fmt = "{:<45} {:<20} {:>9} {:>11} {:>11}"
+    print(fmt.format("NODE", "NODE-GROUP", "READY", "PREPULLED", "FIRST-POD"))
+    for row in rows:
+        cells = [f"{row[k]:.0f}s" if row[k] is not None else "-" for k in ("ready", "prepulled", "first_pod")]
+        print(fmt.format(row["node"], row["node_group"] or "-", *cells))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+import pulumi_aws as aws
+from iam import create_pull_through_cache_policy
+
+
+def mirror_registry(registry, registry_mirrors):
+    """Cache registry standing in for ``registry``, or ``registry`` when not mirrored."""
+    return registry_mirrors.get(registry, registry)
+
+
+def mirror_image(image, registry_mirrors):
+    """Rewrite an image reference to its pull-through cache path when its registry is mirrored.
+
+    ``busybox:1.36`` and ``docker.io/busybox:1.36`` ->
+    ``<cache>/docker-hub/library/busybox:1.36``.
+    """
+    registry, _, path = image.partition("/")
+    if not path or ("." not in registry and ":" not in registry and registry != "localhost"):
+        registry, path = "docker.io", image
+    if registry == "docker.io" and "/" not in path:
+        # Docker Hub official images live under library/, also through the cache.
+        path = f"library/{path}"
+    mirror = registry_mirrors.get(registry)
+    return f"{mirror}/{path}" if mirror else image
+
+
+def setup_pull_through_cache(cfg, node_group_role, base_tags):
+    """Create ECR pull-through cache rules and return the registry mirrors.
+
+    Returns ``{upstream host: cache registry}`` (e.g. ``quay.io`` ->
+    ``<account>.dkr.ecr.<region>.amazonaws.com/quay``), empty when no rules
+    are configured. Image references are rewritten to the cache with
+    ``mirror_image`` / ``mirror_registry`` rather than mirrored in containerd:
+    kubelet's ECR credential provider only authenticates image references
+    whose host is ECR, so a containerd mirror for ``quay.io/...`` would reach
+    ECR without credentials.
+    """
+    rules = cfg["pull_through_cache"]
+    if not rules:
+        return {}
+    account_id = aws.get_caller_identity().account_id
+    ecr_host = f"{account_id}.dkr.ecr.{cfg['region']}.amazonaws.com"
+    mirrors = {}
+    for rule in rules:
+        kwargs = {
+            "ecr_repository_prefix": rule["prefix"],
+            "upstream_registry_url": rule["upstream_url"],
+        }
+        if rule["credential_arn"]:
+            kwargs["credential_arn"] = rule["credential_arn"]
+        aws.ecr.PullThroughCacheRule(f"ptc-{rule['prefix']}", **kwargs)
+        mirrors[rule["upstream"]] = f"{ecr_host}/{rule['prefix']}"
+    create_pull_through_cache_policy(
+        cfg["cluster_name"],
+        node_group_role,
+        cfg["region"],
+        account_id,
+        [rule["prefix"] for rule in rules],
+    )
+    return mirrors
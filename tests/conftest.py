@@ -0,0 +1,23 @@
+import os
+import sys
+from unittest import mock
+
+import pytest
+
+# The project is a flat Pulumi program, not a package: import its modules from the root.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PULUMI_SDK = ("pulumi", "pulumi.runtime", "pulumi_aws", "pulumi_kubernetes")
+# Project modules that import the Pulumi SDK at import time.
+SDK_MODULES = ("addons", "cluster", "iam", "irsa_autoscaler", "registry")
+
+
+@pytest.fixture
+def pulumi_sdk(monkeypatch):
+    """Stand-in Pulumi SDK modules, so the pure helpers of SDK-importing modules can be tested."""
+    for name in PULUMI_SDK:
+        monkeypatch.setitem(sys.modules, name, mock.MagicMock(name=name))
+    yield
+    # Don't leak modules bound to the stand-ins into other tests.
+    for name in SDK_MODULES:
+        sys.modules.pop(name, None)
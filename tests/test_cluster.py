@@ -0,0 +1,74 @@
+from unittest import mock
+
+import pytest
+
+
+@pytest.fixture
+def cluster(pulumi_sdk):
+    import cluster
+
+    return cluster
+
+
+def test_kube_user_token_mode_reads_a_stable_token_file(cluster):
+    import eks_token
+
+    user = cluster._kube_user("token", "eks", "us-west-2", 840)
+    assert user == {"tokenFile": eks_token.token_file("eks", "us-west-2")}
+    assert cluster._kube_user("token", "eks", "us-west-2", 600) == user
+
+
+def test_kube_user_exec_modes(cluster):
+    assert cluster._kube_user("exec", "eks", "us-west-2", 840)["exec"]["command"] == "aws"
+    cached = cluster._kube_user("cached-exec", "eks", "us-west-2", 600)["exec"]
+    assert cached["command"] == "python3"
+    assert cached["args"][:2] == ["-m", "eks_token"]
+    assert cached["args"][-2:] == ["--ttl", "600"]
+
+
+@pytest.mark.parametrize("total, parts, expected", [
+    (7, 3, [3, 2, 2]),
+    (6, 3, [2, 2, 2]),
+    (1, 3, [1, 0, 0]),
+    (0, 2, [0, 0]),
+])
+def test_split_capacity(cluster, total, parts, expected):
+    assert cluster.split_capacity(total, parts) == expected
+    assert sum(cluster.split_capacity(total, parts)) == total
+
+
+AZ_SUBNETS = {"us-west-2a": "subnet-a", "us-west-2b": "subnet-b", "us-west-2c": "subnet-c"}
+ZONAL = {"zonal": True, "desired_capacity": 4, "min_capacity": 2, "max_capacity": 9}
+
+
+def test_zonal_placements_split_every_bound(cluster):
+    assert cluster.zonal_placements("general", ZONAL, AZ_SUBNETS) == [
+        ("general-us-west-2a", "us-west-2a", ["subnet-a"], (2, 1, 3)),
+        ("general-us-west-2b", "us-west-2b", ["subnet-b"], (1, 1, 3)),
+        ("general-us-west-2c", "us-west-2c", ["subnet-c"], (1, 0, 3)),
+    ]
+
+
+def test_zonal_placements_subnet_azs_and_max_bound(cluster):
+    ng = {**ZONAL, "subnet_azs": ["us-west-2c", "us-west-2a"]}
+    assert [(p[0], p[3]) for p in cluster.zonal_placements("gpu", ng, AZ_SUBNETS)] == [
+        ("gpu-us-west-2c", (2, 1, 5)),
+        ("gpu-us-west-2a", (2, 1, 4)),
+    ]
+    with pytest.raises(Exception, match="zonal max_capacity 2 < 3 AZs"):
+        cluster.zonal_placements("gpu", {**ZONAL, "max_capacity": 2}, AZ_SUBNETS)
+
+
+def test_zone_template_tag_goes_on_the_asg(cluster):
+    ng = {**ZONAL, "instance_type": "m6i.large"}
+    groups = cluster.create_node_group(
+        "general", "eks", ng, mock.Mock(), [], AZ_SUBNETS, mock.Mock(), mock.Mock(), {},
+    )
+    assert len(groups) == 3
+    for call in cluster.aws.eks.NodeGroup.call_args_list:
+        assert not any("node-template" in key for key in call.kwargs["tags"])
+    assert cluster.aws.autoscaling.Tag.call_count == 3
+    tags = [call.kwargs for call in cluster.aws.autoscaling.TagTagArgs.call_args_list]
+    assert [(t["key"], t["value"]) for t in tags] == [
+        ("k8s.io/cluster-autoscaler/node-template/label/topology.kubernetes.io/zone", az) for az in AZ_SUBNETS
+    ]
@@ -0,0 +1,66 @@
+import importlib
+import sys
+import types
+from contextvars import ContextVar
+
+import pytest
+
+from validate import ConfigError
+
+NODE_GROUPS = '[{"instance_type": "m6i.large", "desired_capacity": 1, "min_capacity": 1, "max_capacity": 2}]'
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    """``config.load_config`` against a stubbed ``pulumi`` runtime, with ``values``/``env`` to fill in."""
+    values = {}
+    env = {}
+    pulumi = types.ModuleType("pulumi")
+    runtime = types.ModuleType("pulumi.runtime")
+    runtime_config = types.ModuleType("pulumi.runtime.config")
+    runtime_config.get_config_env = lambda: dict(env)
+
+    class Config:
+        def __init__(self, name):
+            self.name = name
+
+        def get(self, key):
+            full = f"{self.name}:{key}"
+            return values.get(full, env.get(full))
+
+    pulumi.Config = Config
+    pulumi.runtime = runtime
+    runtime.config = runtime_config
+    monkeypatch.setitem(sys.modules, "pulumi", pulumi)
+    monkeypatch.setitem(sys.modules, "pulumi.runtime", runtime)
+    monkeypatch.setitem(sys.modules, "pulumi.runtime.config", runtime_config)
+    monkeypatch.delitem(sys.modules, "config", raising=False)
+
+    def load(config_var=True):
+        runtime_config.CONFIG = ContextVar("config", default=values) if config_var else values
+        return importlib.import_module("config").load_config()
+
+    load.values = values
+    load.env = env
+    return load
+
+
+@pytest.mark.parametrize("config_var", [True, False], ids=["contextvar", "dict"])
+def test_load_config_reads_runtime_config(load_config, config_var):
+    load_config.values.update({
+        "eks-cluster:node_groups": NODE_GROUPS,
+        "eks-cluster:max_azs": "2",
+        "aws:region": "eu-west-1",
+    })
+    cfg = load_config(config_var)
+    assert cfg["region"] == "eu-west-1"
+    assert cfg["max_azs"] == 2
+    assert cfg["node_groups"][0]["instance_type"] == "m6i.large"
+
+
+def test_load_config_rejects_unknown_keys_from_env(load_config):
+    load_config.values["eks-cluster:node_groups"] = NODE_GROUPS
+    load_config.env["eks-cluster:enable_prometeus"] = "true"
+    with pytest.raises(ConfigError) as exc:
+        load_config()
+    assert "enable_prometeus: unknown key" in exc.value.errors
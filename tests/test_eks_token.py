@@ -0,0 +1,92 @@
+import json
+import os
+import stat
+
+import pytest
+
+import eks_token
+
+
+@pytest.fixture
+def signer(monkeypatch, tmp_path):
+    """Counts signings instead of calling botocore; isolates the cache and AWS config files."""
+    signed = []
+
+    def generate_token(cluster_name, region):
+        signed.append((cluster_name, region))
+        return f"{eks_token.TOKEN_PREFIX}{len(signed)}"
+
+    monkeypatch.setattr(eks_token, "generate_token", generate_token)
+    monkeypatch.setattr(eks_token, "CACHE_DIR", str(tmp_path / "cache"))
+    for name in ("AWS_PROFILE", "AWS_DEFAULT_PROFILE", *eks_token.IDENTITY_ENV):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_CONFIG_FILE", str(tmp_path / "config"))
+    monkeypatch.setenv("AWS_SHARED_CREDENTIALS_FILE", str(tmp_path / "credentials"))
+    return signed
+
+
+def test_cached_token_hit_and_expiry(signer, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(eks_token.time, "time", lambda: now[0])
+
+    token, expires_at = eks_token.cached_token("eks", "us-west-2", ttl=600)
+    assert (token, expires_at) == (f"{eks_token.TOKEN_PREFIX}1", now[0] + 600)
+    now[0] += 599
+    assert eks_token.cached_token("eks", "us-west-2", ttl=600)[0] == token
+    assert len(signer) == 1
+    now[0] += 1
+    assert eks_token.cached_token("eks", "us-west-2", ttl=600)[0] == f"{eks_token.TOKEN_PREFIX}2"
+    assert len(signer) == 2
+
+
+def test_cached_token_ttl_is_capped(signer, monkeypatch):
+    monkeypatch.setattr(eks_token.time, "time", lambda: 0.0)
+    assert eks_token.cached_token("eks", "us-west-2", ttl=3600)[1] == eks_token.MAX_TOKEN_TTL
+
+
+def test_cache_file_is_private_and_survives_garbage(signer):
+    path = eks_token._cache_path("eks", "us-west-2")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w") as f:
+        f.write("not json")
+    eks_token.cached_token("eks", "us-west-2")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert json.load(open(path))["token"] == f"{eks_token.TOKEN_PREFIX}1"
+
+
+def test_cache_is_keyed_on_identity(signer, monkeypatch, tmp_path):
+    (tmp_path / "config").write_text(
+        "[profile dev]\nrole_arn = arn:aws:iam::111111111111:role/dev\nsource_profile = base\n"
+    )
+    default = eks_token._cache_path("eks", "us-west-2")
+    monkeypatch.setenv("AWS_PROFILE", "dev")
+    dev = eks_token._cache_path("eks", "us-west-2")
+    (tmp_path / "config").write_text(
+        "[profile dev]\nrole_arn = arn:aws:iam::111111111111:role/admin\nsource_profile = base\n"
+    )
+    admin = eks_token._cache_path("eks", "us-west-2")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAEXAMPLE")
+    env_keys = eks_token._cache_path("eks", "us-west-2")
+    assert len({default, dev, admin, env_keys}) == 4
+    assert "AKIAEXAMPLE" not in env_keys
+
+
+def test_exec_credential():
+    cred = eks_token.exec_credential("k8s-aws-v1.abc", 0)
+    assert cred == {
+        "kind": "ExecCredential",
+        "apiVersion": "client.authentication.k8s.io/v1",
+        "spec": {},
+        "status": {"expirationTimestamp": "1970-01-01T00:00:00Z", "token": "k8s-aws-v1.abc"},
+    }
+
+
+def test_main_prints_exec_credential_and_writes_token_file(signer, capsys):
+    assert eks_token.main(["--cluster-name", "eks", "--region", "us-west-2"]) == 0
+    assert json.loads(capsys.readouterr().out)["status"]["token"] == f"{eks_token.TOKEN_PREFIX}1"
+
+    assert eks_token.main(["--cluster-name", "eks", "--region", "us-west-2", "--token-file"]) == 0
+    path = capsys.readouterr().out.strip()
+    assert path == eks_token.token_file("eks", "us-west-2")
+    assert open(path).read() == f"{eks_token.TOKEN_PREFIX}2"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
@@ -0,0 +1,183 @@
+import contextlib
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import fleet
+
+NODE_GROUPS = [{"instance_type": "m6i.large", "desired_capacity": 1, "min_capacity": 1, "max_capacity": 2}]
+
+
+def make_fleet(**extra):
+    return {
+        "defaults": {"node_groups": NODE_GROUPS},
+        "stacks": [
+            {"name": "dev-usw2", "config": {"aws:region": "us-west-2", "cluster_name": "dev-usw2"}},
+            {"name": "dev-euw1", "config": {"aws:region": "eu-west-1", "cluster_name": "dev-euw1"}},
+        ],
+        **extra,
+    }
+
+
+class FakeStack:
+    """Stands in for an automation Stack: no engine, no providers."""
+
+    def __init__(self, name, fail=False, delay=0.0, in_flight=None):
+        self.name = name
+        self.fail = fail
+        self.delay = delay
+        self.in_flight = in_flight
+
+    def _run(self, on_output):
+        if self.in_flight is not None:
+            with self.in_flight["lock"]:
+                self.in_flight["now"] += 1
+                self.in_flight["max"] = max(self.in_flight["max"], self.in_flight["now"])
+        time.sleep(self.delay)
+        on_output(f"updating {self.name}\n")
+        if self.in_flight is not None:
+            with self.in_flight["lock"]:
+                self.in_flight["now"] -= 1
+        if self.fail:
+            raise Exception("boom")
+
+    def preview(self, on_output):
+        self._run(on_output)
+        return types.SimpleNamespace(change_summary={"create": 3})
+
+    def up(self, on_output):
+        self._run(on_output)
+        return types.SimpleNamespace(
+            summary=types.SimpleNamespace(resource_changes={"create": 3}),
+            outputs={"cluster": types.SimpleNamespace(value={
+                "name": self.name,
+                "endpoint": "https://example",
+                "version": "1.30",
+                "node_groups": [{"name": "general"}],
+            })},
+        )
+
+
+def fake_factory(**kwargs):
+    @contextlib.contextmanager
+    def factory(fleet_cfg, stack):
+        yield FakeStack(stack["name"], fail=stack["name"] in kwargs.get("failing", ()),
+                        delay=kwargs.get("delay", 0.0), in_flight=kwargs.get("in_flight"))
+    return factory
+
+
+def test_validate_fleet_merges_defaults_and_overrides(tmp_path):
+    assert fleet.validate_fleet(make_fleet(), project_dir=str(tmp_path)) == {}
+    bad = make_fleet()
+    bad["stacks"][1]["config"]["enable_prometeus"] = True
+    bad["stacks"][1]["config"]["owner"] = {"secure": "v1:abc"}
+    problems = fleet.validate_fleet(bad, project_dir=str(tmp_path))
+    assert list(problems) == ["dev-euw1"]
+    assert "enable_prometeus: unknown key" in problems["dev-euw1"]
+    assert any("secure values are not supported" in e for e in problems["dev-euw1"])
+
+
+def test_validate_fleet_reads_stack_file(tmp_path):
+    (tmp_path / "Pulumi.dev-usw2.yaml").write_text("config:\n  eks-cluster:max_azs: 0\n")
+    problems = fleet.validate_fleet(make_fleet(), project_dir=str(tmp_path))
+    assert problems == {"dev-usw2": ["max_azs: must be > 0"]}
+
+
+def test_run_fleet_up_summarizes_and_isolates_failures():
+    lines = []
+    results = fleet.run_fleet(make_fleet(), "up", stack_factory=fake_factory(failing={"dev-euw1"}), out=lines.append)
+    assert results["dev-usw2"]["ok"]
+    assert results["dev-usw2"]["cluster"] == "dev-usw2"
+    assert results["dev-usw2"]["node_groups"] == ["general"]
+    assert results["dev-euw1"] == {"ok": False, "error": "boom"}
+    assert "[dev-usw2] updating dev-usw2" in lines
+    assert "[dev-euw1] up failed: boom" in lines
+
+
+def test_run_fleet_bounds_concurrency():
+    f = make_fleet()
+    f["stacks"] = [{"name": f"s{i}"} for i in range(6)]
+    in_flight = {"lock": threading.Lock(), "now": 0, "max": 0}
+    results = fleet.run_fleet(f, "preview", concurrency=2,
+                              stack_factory=fake_factory(delay=0.05, in_flight=in_flight), out=lambda _: None)
+    assert all(r["ok"] for r in results.values())
+    assert in_flight["max"] == 2
+
+
+def test_run_fleet_rejects_unknown_operation():
+    with pytest.raises(Exception):
+        fleet.run_fleet(make_fleet(), "destroy", stack_factory=fake_factory())
+
+
+@pytest.fixture
+def fake_automation(monkeypatch):
+    """A pulumi.automation stand-in recording how stacks are created and configured."""
+    calls = {}
+    auto = types.ModuleType("pulumi.automation")
+
+    class ConfigValue:
+        def __init__(self, value, secret=False):
+            self.value = value
+            self.secret = secret
+
+    class Stack(FakeStack):
+        def set_all_config(self, config):
+            calls["config"] = config
+            # What the real workspace does: write the overrides into the stack file.
+            with open(f"{calls['work_dir']}/Pulumi.{self.name}.yaml", "a") as f:
+                f.write("config: {overrides: written}\n")
+
+    def create_or_select_stack(stack_name, work_dir, opts):
+        calls.update(work_dir=work_dir, env_vars=opts.env_vars, secrets_provider=opts.secrets_provider)
+        with open(f"{work_dir}/Pulumi.{stack_name}.yaml", "w") as f:
+            f.write("encryptionsalt: v1:salt\n")
+        return Stack(stack_name)
+
+    auto.ConfigValue = ConfigValue
+    auto.LocalWorkspaceOptions = lambda env_vars, secrets_provider: types.SimpleNamespace(
+        env_vars=env_vars, secrets_provider=secrets_provider)
+    auto.create_or_select_stack = create_or_select_stack
+    pulumi = types.ModuleType("pulumi")
+    pulumi.automation = auto
+    monkeypatch.setitem(sys.modules, "pulumi", pulumi)
+    monkeypatch.setitem(sys.modules, "pulumi.automation", auto)
+    return calls
+
+
+def test_default_factory_uses_file_backend_and_temporary_work_dir(tmp_path, fake_automation):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "Pulumi.yaml").write_text("name: eks-py\nruntime: python\n")
+    backend = tmp_path / "state"
+    f = make_fleet(backend_url=f"file://{backend}", secrets_provider="passphrase")
+    f["stacks"][0]["config"]["owner"] = {"secret": "alice"}
+    factory = lambda fl, st: fleet.default_stack_factory(fl, st, project_dir=str(project))
+
+    results = fleet.run_fleet({**f, "stacks": f["stacks"][:1]}, "preview", stack_factory=factory, out=lambda _: None)
+
+    assert results["dev-usw2"]["ok"]
+    assert fake_automation["env_vars"] == {"PULUMI_BACKEND_URL": f"file://{backend}"}
+    assert fake_automation["secrets_provider"] == "passphrase"
+    assert not fake_automation["work_dir"].startswith(str(project))
+    config = fake_automation["config"]
+    assert config["eks-cluster:cluster_name"].value == "dev-usw2"
+    assert config["eks-cluster:node_groups"].value == fleet.json.dumps(NODE_GROUPS)
+    assert (config["eks-cluster:owner"].value, config["eks-cluster:owner"].secret) == ("alice", True)
+    # The new stack's salt is kept, the overrides are not.
+    assert (project / "Pulumi.dev-usw2.yaml").read_text() == "encryptionsalt: v1:salt\n"
+
+
+def test_default_factory_leaves_existing_stack_file_untouched(tmp_path, fake_automation):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "Pulumi.yaml").write_text("name: eks-py\nruntime: python\n")
+    (project / "Pulumi.dev-usw2.yaml").write_text("config:\n  eks-cluster:owner: me\n")
+    factory = lambda fl, st: fleet.default_stack_factory(fl, st, project_dir=str(project))
+
+    f = make_fleet()
+    fleet.run_fleet({**f, "stacks": f["stacks"][:1]}, "preview", stack_factory=factory, out=lambda _: None)
+
+    assert (project / "Pulumi.dev-usw2.yaml").read_text() == "config:\n  eks-cluster:owner: me\n"
@@ -0,0 +1,67 @@
+import pytest
+
+CACHE = "123456789012.dkr.ecr.us-west-2.amazonaws.com"
+MIRRORS = {
+    "docker.io": f"{CACHE}/docker-hub",
+    "quay.io": f"{CACHE}/quay",
+    "registry.k8s.io": f"{CACHE}/k8s",
+    "public.ecr.aws": f"{CACHE}/ecr-public",
+}
+
+
+@pytest.fixture
+def registry(pulumi_sdk):
+    import registry
+
+    return registry
+
+
+@pytest.fixture
+def addons(pulumi_sdk):
+    import addons
+
+    return addons
+
+
+@pytest.mark.parametrize("image, expected", [
+    ("busybox:1.36", f"{CACHE}/docker-hub/library/busybox:1.36"),
+    ("docker.io/busybox:1.36", f"{CACHE}/docker-hub/library/busybox:1.36"),
+    ("docker.io/library/busybox", f"{CACHE}/docker-hub/library/busybox"),
+    ("grafana/grafana:10.4.0", f"{CACHE}/docker-hub/grafana/grafana:10.4.0"),
+    ("docker.io/grafana/grafana", f"{CACHE}/docker-hub/grafana/grafana"),
+    ("quay.io/prometheus/prometheus:v2.51.0", f"{CACHE}/quay/prometheus/prometheus:v2.51.0"),
+    ("registry.k8s.io/pause:3.9", f"{CACHE}/k8s/pause:3.9"),
+    ("public.ecr.aws/eks-distro/kubernetes-csi/livenessprobe",
+     f"{CACHE}/ecr-public/eks-distro/kubernetes-csi/livenessprobe"),
+    ("ghcr.io/org/app:1", "ghcr.io/org/app:1"),
+    ("localhost:5000/app", "localhost:5000/app"),
+])
+def test_mirror_image(registry, image, expected):
+    assert registry.mirror_image(image, MIRRORS) == expected
+
+
+def test_mirror_image_without_mirrors_is_unchanged(registry):
+    assert registry.mirror_image("busybox:1.36", {}) == "busybox:1.36"
+    assert registry.mirror_registry("quay.io", {}) == "quay.io"
+
+
+def test_image_values_rewrite_every_chart_image(addons):
+    cfg = {"registry_mirrors": MIRRORS}
+    for chart, images in addons.CHART_IMAGES.items():
+        values = addons.image_values(cfg, chart)
+        for path in images:
+            node = values
+            for key in path.split("."):
+                node = node[key]
+            assert node.startswith(f"{CACHE}/"), (chart, path, node)
+
+
+def test_image_values(addons):
+    cfg = {"registry_mirrors": {"quay.io": MIRRORS["quay.io"]}}
+    assert addons.image_values(cfg, "cluster-autoscaler") == {}
+    assert addons.image_values({}, "kube-prom-stack") == {}
+    values = addons.image_values(cfg, "kube-prom-stack")
+    assert values["prometheus"]["prometheusSpec"]["image"]["registry"] == f"{CACHE}/quay"
+    assert values["prometheusOperator"]["image"]["registry"] == f"{CACHE}/quay"
+    assert "kube-state-metrics" not in values
+    assert values["grafana"] == {"sidecar": {"image": {"registry": f"{CACHE}/quay"}}}
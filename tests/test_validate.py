@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from validate import ConfigError, main, read_stack_file, validate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NODE_GROUP = {"instance_type": "m6i.large", "desired_capacity": 2, "min_capacity": 1, "max_capacity": 3}
+
+
+def errors_for(raw, region=None):
+    with pytest.raises(ConfigError) as exc:
+        validate(raw, region)
+    return exc.value.errors
+
+
+def test_sample_stack_file_is_valid():
+    raw, region = read_stack_file(os.path.join(ROOT, "Pulumi.sample.yaml"))
+    cfg = validate(raw, region)
+    assert cfg["region"] == "us-west-2"
+    assert [ng["name"] for ng in cfg["node_groups"]] == ["system", "general", "batch-arm"]
+
+
+def test_defaults_and_engine_strings():
+    cfg = validate({
+        "node_groups": '[{"instance_type": "m6i.large", "desired_capacity": 1, "min_capacity": 1, "max_capacity": 2}]',
+        "public_access": "true",
+        "max_azs": "2",
+    })
+    assert cfg["public_access"] is True
+    assert cfg["max_azs"] == 2
+    assert cfg["cluster_name"] == "eks-cluster"
+    assert cfg["node_groups"][0]["name"] == "node-group-0"
+    assert cfg["cluster_deletion_protection"] is False
+
+
+def test_reports_every_error_at_once():
+    errors = errors_for({
+        "enable_prometeus": True,
+        "cluster_version": 1.3,
+        "public_access": "nope",
+        "vpc_cidr": "10.0.0.0/30",
+        "node_groups": [{**NODE_GROUP, "architecture": "arm64", "desired_capacity": 5, "foo": 1}],
+    })
+    assert "enable_prometeus: unknown key" in errors
+    assert any(e.startswith("cluster_version: must be a string") for e in errors)
+    assert any(e.startswith("public_access: must be a boolean") for e in errors)
+    assert any(e.startswith("vpc_cidr:") for e in errors)
+    assert "node_groups[0].foo: unknown key" in errors
+    assert any("capacity invalid" in e for e in errors)
+    assert any("not ARM" in e for e in errors)
+
+
+def test_taint_effects_are_normalized_and_system_role_applied():
+    cfg = validate({"node_groups": [{
+        **NODE_GROUP,
+        "system": True,
+        "taints": [{"key": "workload", "value": "batch", "effect": "NoSchedule"}],
+    }]})
+    ng = cfg["node_groups"][0]
+    assert ng["taints"] == [
+        {"key": "workload", "value": "batch", "effect": "NO_SCHEDULE"},
+        {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_SCHEDULE"},
+    ]
+    assert ng["labels"] == {"node-role": "system"}
+
+
+def test_cross_field_rules():
+    errors = errors_for({
+        "public_access": False,
+        "private_access": False,
+        "enable_vpa": True,
+        "max_azs": 1,
+        "node_groups": [
+            {**NODE_GROUP, "subnet_azs": ["us-east-1a"]},
+            {**NODE_GROUP, "name": "z", "zonal": True, "subnet_ids": ["subnet-1"]},
+            {**NODE_GROUP, "name": "u", "max_unavailable": 1, "max_unavailable_percentage": 10},
+        ],
+    }, "us-west-2")
+    assert any("endpoint access" in e for e in errors)
+    assert any(e.startswith("enable_vpa:") for e in errors)
+    assert "node_groups[0].subnet_azs: us-east-1a is not in region us-west-2" in errors
+    assert any("zonal needs subnet_azs" in e for e in errors)
+    assert any("choose max_unavailable OR" in e for e in errors)
+
+
+def test_pull_through_cache_rules():
+    errors = errors_for({"node_groups": [NODE_GROUP], "pull_through_cache": [
+        {"upstream": "docker.io"},
+        {"upstream": "gcr.io"},
+    ]})
+    assert "pull_through_cache[0].credential_arn: required for docker.io" in errors
+    assert any(e.startswith("pull_through_cache[1].upstream:") for e in errors)
+    cfg = validate({"node_groups": [NODE_GROUP], "pull_through_cache": [{"upstream": "quay.io"}]})
+    assert cfg["pull_through_cache"][0]["prefix"] == "quay"
+
+
+@pytest.mark.parametrize("key", ["kube_token_ttl", "metrics_server_resolution", "vpc_cidr", "trusted_cidrs"])
+def test_secure_values_are_opaque(key):
+    cfg = validate({"node_groups": [NODE_GROUP], key: {"secure": "v1:abc"}})
+    assert cfg["node_groups"]
+
+
+def test_cli_exit_codes(tmp_path, capsys):
+    bad = tmp_path / "Pulumi.bad.yaml"
+    bad.write_text("config:\n  eks-cluster:node_groups: []\n  eks-cluster:typo: 1\n")
+    assert main([os.path.join(ROOT, "Pulumi.sample.yaml")]) == 0
+    assert main([str(bad)]) == 1
+    out = capsys.readouterr().out
+    assert "typo: unknown key" in out
+    assert "node_groups: must be a non-empty list" in out
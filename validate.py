@@ -0,0 +1,462 @@
+"""Offline validation of the stack configuration.
+
+This module has no Pulumi dependency so it can check a ``Pulumi.<stack>.yaml``
+file without starting the engine or any provider. ``config.load_config`` runs
+the same checks at deploy time, so both paths accept and reject the same
+configuration.
+
+Usage::
+
+    python validate.py dev               # reads Pulumi.dev.yaml
+    python validate.py path/to/Pulumi.prod.yaml
+"""
+import argparse
+import ipaddress
+import json
+import os
+import re
+import sys
+
+NAMESPACE = "eks-cluster"
+DEFAULT_REGION = "us-west-2"
+
+ARCHITECTURES = ("x86_64", "arm64")
+AMI_FAMILIES = ("al2", "bottlerocket")
+KUBE_AUTH_MODES = ("exec", "cached-exec", "token")
+UPDATE_STRATEGIES = ("rolling", "blue_green")
+CLUSTER_LOG_TYPES = ("api", "audit", "authenticator", "controllerManager", "scheduler")
+LOG_RETENTION_DAYS = (
+    1, 3, 5, 7, 14, 30, 60, 90, 120, 150, 180, 365, 400, 545, 731, 1096, 1827, 2192, 2557, 2922, 3288, 3653,
+)
+# EKS API spelling; the Kubernetes spelling (NoSchedule, ...) is accepted and mapped.
+TAINT_EFFECTS = {
+    "NO_SCHEDULE": "NO_SCHEDULE",
+    "NOSCHEDULE": "NO_SCHEDULE",
+    "NO_EXECUTE": "NO_EXECUTE",
+    "NOEXECUTE": "NO_EXECUTE",
+    "PREFER_NO_SCHEDULE": "PREFER_NO_SCHEDULE",
+    "PREFERNOSCHEDULE": "PREFER_NO_SCHEDULE",
+}
+# Upstreams ECR pull-through cache supports that our images come from:
+# upstream host -> (registry URL for the rule, default repository prefix, needs credentials).
+PULL_THROUGH_UPSTREAMS = {
+    "docker.io": ("registry-1.docker.io", "docker-hub", True),
+    "ghcr.io": ("ghcr.io", "ghcr", True),
+    "quay.io": ("quay.io", "quay", False),
+    "registry.k8s.io": ("registry.k8s.io", "k8s", False),
+    "public.ecr.aws": ("public.ecr.aws", "ecr-public", False),
+}
+ECR_PREFIX_RE = re.compile(r"^[a-z0-9]+(?:[._-][a-z0-9]+)*$")
+# Taint and label applied to ``system: true`` node groups; addons.py targets them.
+SYSTEM_TAINT = {"key": "CriticalAddonsOnly", "value": "true", "effect": "NO_SCHEDULE"}
+SYSTEM_NODE_LABELS = {"node-role": "system"}
+NODE_GROUP_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,62}$")
+AZ_RE = re.compile(r"^[a-z]{2}(-[a-z]+)+-\d[a-z]$")
+
+# Top-level keys under the ``eks-cluster`` namespace. A ``default`` of None
+# means the value is derived in ``_check_cluster`` (or simply left unset).
+SCHEMA = {
+    "environment": {"type": str, "default": "dev"},
+    "owner": {"type": str, "default": "team-platform"},
+    "cost_center": {"type": str, "default": "shared"},
+    "cluster_name": {"type": str, "default": "eks-cluster"},
+    "cluster_version": {"type": str, "default": "1.30"},
+    "cluster_log_types": {"type": list, "default": list(CLUSTER_LOG_TYPES)},
+    "log_retention_days": {"type": int, "default": 30},
+    "public_access": {"type": bool, "default": False},
+    "private_access": {"type": bool, "default": True},
+    "public_access_cidrs": {"type": list, "default": ["0.0.0.0/0"]},
+    "trusted_cidrs": {"type": list, "default": []},
+    "enable_efs": {"type": bool, "default": False},
+    "enable_ebs": {"type": bool, "default": False},
+    "enable_prometheus": {"type": bool, "default": False},
+    "enable_ingress": {"type": bool, "default": False},
+    "enable_managed_addons": {"type": bool, "default": True},
+    "enable_kms_encryption": {"type": bool, "default": True},
+    "efs_csi_driver_version": {"type": str, "default": "2.5.0"},
+    "ebs_csi_driver_version": {"type": str, "default": "2.26.1"},
+    "ingress_nginx_version": {"type": str, "default": "4.10.0"},
+    "prometheus_stack_version": {"type": str, "default": "55.5.0"},
+    "autoscaler_chart_version": {"type": str, "default": "9.29.0"},
+    "ingress_nginx_values": {"type": dict, "default": {"controller": {"service": {"type": "LoadBalancer"}}}},
+    "prometheus_stack_values": {"type": dict, "default": {"prometheus": {"service": {"type": "ClusterIP"}}}},
+    "enable_metrics_server": {"type": bool, "default": False},
+    "metrics_server_version": {"type": str, "default": "3.12.1"},
+    "metrics_server_replicas": {"type": int, "default": 2},
+    "metrics_server_resolution": {"type": str, "default": "15s"},
+    "metrics_server_values": {"type": dict, "default": {}},
+    "enable_vpa": {"type": bool, "default": False},
+    "vpa_chart_version": {"type": str, "default": "4.4.6"},
+    "vpa_values": {"type": dict, "default": {}},
+    "pull_through_cache": {"type": list, "default": []},
+    "soci_snapshotter_version": {"type": str, "default": "0.9.0"},
+    "soci_snapshotter_url": {"type": str, "default": None},
+    "soci_snapshotter_sha256": {"type": str, "default": None},
+    "kube_auth": {"type": str, "default": "exec", "choices": KUBE_AUTH_MODES},
+    "kube_token_ttl": {"type": int, "default": 840},
+    "cluster_deletion_protection": {"type": bool, "default": None},
+    "efs_deletion_protection": {"type": bool, "default": None},
+    "vpc_cidr": {"type": str, "default": "10.100.0.0/16"},
+    "oidc_thumbprint": {"type": str, "default": "9e99a48a9960b14926bb7f3b02e22da0ecd2e9d0"},
+    "addon_versions": {"type": dict, "default": {"vpc-cni": None, "kube-proxy": None, "coredns": None}},
+    "node_groups": {"type": list, "default": None},
+    "max_azs": {"type": int, "default": None},
+}
+
+# Keys of each ``node_groups[]`` entry.
+NODE_GROUP_SCHEMA = {
+    "name": {"type": str, "default": None},
+    "instance_type": {"type": str, "default": None, "required": True},
+    "desired_capacity": {"type": int, "default": None, "required": True},
+    "min_capacity": {"type": int, "default": None, "required": True},
+    "max_capacity": {"type": int, "default": None, "required": True},
+    "architecture": {"type": str, "default": "x86_64", "choices": ARCHITECTURES},
+    "ami_family": {"type": str, "default": "al2", "choices": AMI_FAMILIES},
+    "ami_id": {"type": str, "default": None},
+    "ssh_keypair_name": {"type": str, "default": None},
+    "labels": {"type": dict, "default": {}},
+    "taints": {"type": list, "default": []},
+    "subnet_ids": {"type": list, "default": None},
+    "subnet_azs": {"type": list, "default": None},
+    "zonal": {"type": bool, "default": False},
+    "system": {"type": bool, "default": False},
+    "prepull_images": {"type": list, "default": []},
+    "soci": {"type": bool, "default": False},
+    "update_strategy": {"type": str, "default": "rolling", "choices": UPDATE_STRATEGIES},
+    "max_unavailable": {"type": int, "default": None},
+    "max_unavailable_percentage": {"type": int, "default": None},
+}
+
+_TYPE_NAMES = {str: "a string", bool: "a boolean", int: "an integer", list: "a list", dict: "an object"}
+
+
+class ConfigError(Exception):
+    """Raised with every problem found in a configuration, not just the first."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("Invalid configuration:\n" + "\n".join(f"  - {e}" for e in self.errors))
+
+
+def instance_type_arch_error(instance_type, arch):
+    """Return a message if ``instance_type`` cannot run ``arch``, else None."""
+    family = instance_type.split(".")[0]
+    arm_families = ("c6g","c7g","m6g","m7g","r6g","r7g","t4g","x2g","a1")
+    is_arm = (family in arm_families) or (family.endswith("g") and family not in ("g5","g4dn"))
+    if arch == "arm64" and not is_arm:
+        return f"{instance_type} not ARM"
+    if arch == "x86_64" and is_arm:
+        return f"{instance_type} is ARM family"
+    return None
+
+
+def _coerce(value, kind, path, errors):
+    """Coerce a raw config value to ``kind``; record an error and return None on failure.
+
+    Scalars arrive as strings from the engine and as native YAML values from
+    the stack file; objects arrive as JSON strings from the engine.
+    """
+    if kind is bool:
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+    elif kind is int:
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        if isinstance(value, str) and re.fullmatch(r"-?\d+", value.strip()):
+            return int(value)
+    elif kind is str:
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            errors.append(f"{path}: must be a string; quote it in YAML (got {value!r})")
+            return None
+    elif kind in (list, dict):
+        if isinstance(value, str):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                errors.append(f"{path}: must be {_TYPE_NAMES[kind]} (got unparsable {value!r})")
+                return None
+        if isinstance(value, kind):
+            return value
+    errors.append(f"{path}: must be {_TYPE_NAMES[kind]} (got {type(value).__name__} {value!r})")
+    return None
+
+
+def _apply_schema(raw, schema, path, errors):
+    """Type-check ``raw`` against ``schema`` and fill in defaults."""
+    out = {}
+    for key in sorted(set(raw) - set(schema)):
+        errors.append(f"{path}{key}: unknown key")
+    for key, spec in schema.items():
+        value = raw.get(key)
+        if value is None:
+            if spec.get("required"):
+                errors.append(f"{path}{key}: required")
+            out[key] = spec["default"]
+            continue
+        if isinstance(value, dict) and set(value) == {"secure"}:
+            # Ciphertext is opaque offline (the engine decrypts it at runtime):
+            # check the rest of the config against the default instead.
+            out[key] = spec["default"]
+            continue
+        value = _coerce(value, spec["type"], f"{path}{key}", errors)
+        if value is not None and spec.get("choices") and value not in spec["choices"]:
+            errors.append(f"{path}{key}: must be one of {list(spec['choices'])} (got {value!r})")
+            value = None
+        out[key] = spec["default"] if value is None else value
+    return out
+
+
+def _check_cidr(value, path, errors):
+    try:
+        return ipaddress.ip_network(value)
+    except (TypeError, ValueError):
+        errors.append(f"{path}: invalid CIDR {value!r}")
+        return None
+
+
+def _check_vpc_cidr(cfg, errors):
+    net = _check_cidr(cfg["vpc_cidr"], "vpc_cidr", errors)
+    if net is None:
+        return
+    # Mirrors the subnet carving in network.create_vpc.
+    if net.prefixlen > 28:
+        errors.append(f"vpc_cidr: {cfg['vpc_cidr']} is too small (needs /28 or larger)")
+        return
+    new_prefix = 24 if net.prefixlen < 24 else min(net.prefixlen + 1, 28)
+    available = 2 ** (new_prefix - net.prefixlen)
+    if cfg["max_azs"] is not None and available < cfg["max_azs"]:
+        errors.append(
+            f"vpc_cidr: {cfg['vpc_cidr']} yields {available} subnet(s), fewer than max_azs={cfg['max_azs']}"
+        )
+
+
+def _check_node_group(i, ng, region, errors):
+    path = f"node_groups[{i}]"
+    ng = _apply_schema(ng, NODE_GROUP_SCHEMA, f"{path}.", errors)
+    ng["name"] = ng["name"] or f"node-group-{i}"
+    if not NODE_GROUP_NAME_RE.match(ng["name"]):
+        errors.append(f"{path}.name: {ng['name']!r} must be 1-63 letters, digits, '-' or '_'")
+
+    desired, min_c, max_c = ng["desired_capacity"], ng["min_capacity"], ng["max_capacity"]
+    if None not in (desired, min_c, max_c):
+        if min_c < 0 or max_c < 1:
+            errors.append(f"{path}: min_capacity must be >= 0 and max_capacity >= 1")
+        elif not (min_c <= desired <= max_c):
+            errors.append(f"{path}: capacity invalid, need min_capacity <= desired_capacity <= max_capacity")
+
+    if ng["max_unavailable"] is not None and ng["max_unavailable_percentage"] is not None:
+        errors.append(f"{path}: choose max_unavailable OR max_unavailable_percentage")
+    for key in ("max_unavailable", "max_unavailable_percentage"):
+        if ng[key] is not None and not 1 <= ng[key] <= 100:
+            errors.append(f"{path}.{key}: must be between 1 and 100 (got {ng[key]})")
+
+    for img_idx, image in enumerate(ng["prepull_images"]):
+        if not isinstance(image, str) or not image or any(c.isspace() for c in image):
+            errors.append(f"{path}.prepull_images[{img_idx}]: {image!r} is not an image reference")
+
+    if ng["instance_type"]:
+        msg = instance_type_arch_error(ng["instance_type"], ng["architecture"])
+        if msg:
+            errors.append(f"{path}.instance_type: {msg} (architecture={ng['architecture']})")
+
+    for key, value in ng["labels"].items():
+        if not isinstance(value, str):
+            errors.append(f"{path}.labels.{key}: must be a string (got {value!r})")
+
+    taints = []
+    for t_idx, t in enumerate(ng["taints"]):
+        t_path = f"{path}.taints[{t_idx}]"
+        if not isinstance(t, dict) or "key" not in t or "effect" not in t:
+            errors.append(f"{t_path}: needs key/effect")
+            continue
+        for key in sorted(set(t) - {"key", "value", "effect"}):
+            errors.append(f"{t_path}.{key}: unknown key")
+        effect = TAINT_EFFECTS.get(str(t["effect"]).upper())
+        if effect is None:
+            errors.append(f"{t_path}.effect: must be NoSchedule, NoExecute or PreferNoSchedule (got {t['effect']!r})")
+            continue
+        taints.append({"key": t["key"], "value": t.get("value"), "effect": effect})
+    if ng["system"]:
+        if not any(t["key"] == SYSTEM_TAINT["key"] for t in taints):
+            taints.append(dict(SYSTEM_TAINT))
+        ng["labels"] = {**ng["labels"], **SYSTEM_NODE_LABELS}
+    ng["taints"] = taints
+
+    if ng["subnet_ids"] and ng["subnet_azs"]:
+        errors.append(f"{path}: choose subnet_ids OR subnet_azs")
+    for az in ng["subnet_azs"] or []:
+        if not isinstance(az, str) or not AZ_RE.match(az):
+            errors.append(f"{path}.subnet_azs: {az!r} is not an availability zone name")
+        elif not az.startswith(region):
+            errors.append(f"{path}.subnet_azs: {az} is not in region {region}")
+    if ng["subnet_azs"] and len(set(ng["subnet_azs"])) != len(ng["subnet_azs"]):
+        errors.append(f"{path}.subnet_azs: duplicate AZs {ng['subnet_azs']}")
+    if ng["zonal"]:
+        if ng["subnet_ids"]:
+            errors.append(f"{path}: zonal needs subnet_azs (or none), not subnet_ids")
+        elif ng["subnet_azs"] and max_c is not None and max_c < len(ng["subnet_azs"]):
+            errors.append(f"{path}: zonal max_capacity {max_c} < {len(ng['subnet_azs'])} AZs")
+    return ng
+
+
+def _check_pull_through_cache(cfg, errors):
+    rules = []
+    seen = set()
+    for i, rule in enumerate(cfg["pull_through_cache"]):
+        path = f"pull_through_cache[{i}]"
+        if not isinstance(rule, dict):
+            errors.append(f"{path}: must be an object")
+            continue
+        for key in sorted(set(rule) - {"upstream", "prefix", "credential_arn"}):
+            errors.append(f"{path}.{key}: unknown key")
+        upstream = rule.get("upstream")
+        if upstream not in PULL_THROUGH_UPSTREAMS:
+            errors.append(f"{path}.upstream: must be one of {list(PULL_THROUGH_UPSTREAMS)} (got {upstream!r})")
+            continue
+        url, default_prefix, needs_credential = PULL_THROUGH_UPSTREAMS[upstream]
+        prefix = rule.get("prefix") or default_prefix
+        if not isinstance(prefix, str) or not 2 <= len(prefix) <= 30 or not ECR_PREFIX_RE.match(prefix):
+            errors.append(f"{path}.prefix: {prefix!r} is not a valid ECR repository prefix")
+        credential_arn = rule.get("credential_arn")
+        if needs_credential and not credential_arn:
+            errors.append(f"{path}.credential_arn: required for {upstream}")
+        if credential_arn and not str(credential_arn).startswith("arn:aws:secretsmanager:"):
+            errors.append(f"{path}.credential_arn: must be a Secrets Manager secret ARN")
+        elif credential_arn and ":secret:ecr-pullthroughcache/" not in credential_arn:
+            errors.append(f"{path}.credential_arn: secret name must start with ecr-pullthroughcache/")
+        for key in (upstream, prefix):
+            if key in seen:
+                errors.append(f"{path}: duplicate upstream/prefix {key!r}")
+            seen.add(key)
+        rules.append({"upstream": upstream, "upstream_url": url, "prefix": prefix, "credential_arn": credential_arn})
+    cfg["pull_through_cache"] = rules
+
+
+def _check_cluster(cfg, region, errors):
+    if not (cfg["public_access"] or cfg["private_access"]):
+        errors.append("public_access/private_access: enable at least one endpoint access mode")
+    for path in ("public_access_cidrs", "trusted_cidrs"):
+        for cidr in cfg[path]:
+            _check_cidr(cidr, path, errors)
+    unknown_logs = [t for t in cfg["cluster_log_types"] if t not in CLUSTER_LOG_TYPES]
+    if unknown_logs:
+        errors.append(f"cluster_log_types: unknown {unknown_logs}, allowed {list(CLUSTER_LOG_TYPES)}")
+    if cfg["log_retention_days"] not in LOG_RETENTION_DAYS:
+        errors.append(f"log_retention_days: {cfg['log_retention_days']} is not a CloudWatch retention period")
+    if cfg["max_azs"] is not None and cfg["max_azs"] <= 0:
+        errors.append("max_azs: must be > 0")
+    _check_vpc_cidr(cfg, errors)
+
+    m = re.fullmatch(r"(\d+)(s|m)", cfg["metrics_server_resolution"] or "")
+    if not m:
+        errors.append(f"metrics_server_resolution: must look like 15s or 1m (got {cfg['metrics_server_resolution']!r})")
+    elif int(m.group(1)) * (60 if m.group(2) == "m" else 1) < 10:
+        errors.append("metrics_server_resolution: must be at least 10s")
+    if cfg["metrics_server_replicas"] < 1:
+        errors.append("metrics_server_replicas: must be >= 1")
+    if cfg["enable_vpa"] and not cfg["enable_metrics_server"]:
+        errors.append("enable_vpa: the VPA recommender reads the metrics API; set enable_metrics_server too")
+    _check_pull_through_cache(cfg, errors)
+    if cfg["soci_snapshotter_sha256"] and not re.fullmatch(r"[0-9a-f]{64}", cfg["soci_snapshotter_sha256"]):
+        errors.append("soci_snapshotter_sha256: must be a hex SHA-256 digest")
+    if not 60 <= cfg["kube_token_ttl"] <= 900:
+        errors.append(f"kube_token_ttl: must be between 60 and 900 seconds, EKS token lifetime (got {cfg['kube_token_ttl']})")
+
+    if cfg["cluster_deletion_protection"] is None:
+        cfg["cluster_deletion_protection"] = cfg["environment"] == "prod"
+    if cfg["efs_deletion_protection"] is None:
+        cfg["efs_deletion_protection"] = cfg["environment"] == "prod"
+
+    node_groups_raw = cfg["node_groups"]
+    if not node_groups_raw:
+        errors.append("node_groups: must be a non-empty list")
+        cfg["node_groups"] = []
+        return
+    seen = set()
+    node_groups = []
+    for i, ng in enumerate(node_groups_raw):
+        if not isinstance(ng, dict):
+            errors.append(f"node_groups[{i}]: must be an object")
+            continue
+        ng = _check_node_group(i, ng, region, errors)
+        if ng["name"] in seen:
+            errors.append(f"node_groups[{i}].name: duplicate node group name '{ng['name']}'")
+        seen.add(ng["name"])
+        node_groups.append(ng)
+    cfg["node_groups"] = node_groups
+
+    used_azs = {az for ng in node_groups for az in ng["subnet_azs"] or []}
+    if cfg["max_azs"] is not None and len(used_azs) > cfg["max_azs"]:
+        errors.append(f"node_groups: subnet_azs span {len(used_azs)} AZs but max_azs={cfg['max_azs']}")
+
+
+def validate(raw, region=None):
+    """Validate raw ``eks-cluster`` config values and return the normalized config.
+
+    ``raw`` maps unqualified keys (``cluster_name``, ...) to either native
+    YAML values or the strings the engine hands out. Raises ``ConfigError``
+    listing every problem found.
+    """
+    errors = []
+    region = region or DEFAULT_REGION
+    cfg = _apply_schema(raw, SCHEMA, "", errors)
+    cfg["region"] = region
+    _check_cluster(cfg, region, errors)
+    if errors:
+        raise ConfigError(errors)
+    return cfg
+
+
+def read_stack_file(path):
+    """Split a ``Pulumi.<stack>.yaml`` file into (raw eks-cluster config, region)."""
+    import yaml
+
+    with open(path) as f:
+        doc = yaml.safe_load(f) or {}
+    raw = {}
+    region = None
+    for key, value in (doc.get("config") or {}).items():
+        ns, _, name = key.partition(":")
+        if ns == NAMESPACE:
+            raw[name] = value
+        elif key == "aws:region":
+            region = value
+    return raw, region
+
+
+def _resolve_stack_file(target):
+    if os.path.isfile(target):
+        return target
+    here = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(here, f"Pulumi.{target}.yaml")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate stack configuration without the Pulumi engine.")
+    parser.add_argument("stacks", nargs="+", help="stack name (reads Pulumi.<stack>.yaml) or path to a stack file")
+    args = parser.parse_args(argv)
+    failed = False
+    for target in args.stacks:
+        path = _resolve_stack_file(target)
+        try:
+            raw, region = read_stack_file(path)
+            cfg = validate(raw, region)
+        except OSError as e:
+            print(f"{target}: {e}")
+            failed = True
+        except ConfigError as e:
+            print(f"{path}: {len(e.errors)} error(s)")
+            for err in e.errors:
+                print(f"  - {err}")
+            failed = True
+        else:
+            print(f"{path}: OK ({len(cfg['node_groups'])} node group(s), region {cfg['region']})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())